@@ -1,173 +1,142 @@
-from import_export.admin import ImportExportModelAdmin
 from django.contrib import admin
 from .models import Book, Borrower, BorrowRequest, ReturnRequest
+from .signals import bump_dashboard_version
 from import_export.admin import ImportExportModelAdmin
 from import_export import resources
+from import_export.formats import base_formats
 from django.utils.html import format_html
 from django.urls import reverse
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Now
 from django.utils import timezone
+from functools import lru_cache
+from io import BytesIO, StringIO
+import openpyxl
+import re
+import tablib
 
 
 # Register your models here.
 
 
+REQUEST_STATUS_LABELS = dict(BorrowRequest.STATUS_CHOICES)
+
+# Characters with a meaning in to_tsquery syntax, stripped from search terms
+TSQUERY_SPECIAL = re.compile(r"[&|!():*<>'\\\s]+")
+
+
+def _is_changelist(request, model):
+    """Check whether the request is for the admin changelist of the given model"""
+    url_name = f'{model._meta.app_label}_{model._meta.model_name}_changelist'
+    return getattr(request.resolver_match, 'url_name', None) == url_name
+
+
+@lru_cache(maxsize=None)
+def _url_template(url_name):
+    """Resolve a URL once with a placeholder pk, ready for str.format"""
+    return reverse(url_name, args=[0]).replace('/0/', '/{}/')
+
+
+class ReadOnlyXLSX(base_formats.XLSX):
+    """XLSX format that streams plain cell values instead of building cell objects"""
+    
+    def create_dataset(self, in_stream):
+        workbook = openpyxl.load_workbook(BytesIO(in_stream), read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            dataset = tablib.Dataset(headers=list(next(rows, ())))
+            for row in rows:
+                dataset.append(row)
+        finally:
+            workbook.close()
+        return dataset
+
+
 class BookResource(resources.ModelResource):
+    def import_data(self, *args, **kwargs):
+        """Run the whole import in one transaction, skipping per-commit WAL flushes on PostgreSQL"""
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    # Only affects this transaction; a crash can lose the import but never corrupts data
+                    cursor.execute('SET LOCAL synchronous_commit = off')
+            return super().import_data(*args, **kwargs)
     
-    def before_import_row(self, row, **kwargs):
-        """Clean and map data before importing"""
-        import pandas as pd
-        from datetime import datetime
+    def before_import(self, dataset, *args, **kwargs):
+        """Clean and map the whole dataset in one pandas pass before importing"""
+        # pandas is only needed here, so web workers that never import books don't load it
+        from .book_import import clean_book_dataset
+        clean_book_dataset(dataset)
         
-        def clean_value(value):
-            """Clean individual values, handling NaN and empty strings"""
-            if pd.isna(value) or value == 'NaN' or str(value).strip() == '':
-                return None
-            return str(value).strip()
+        # Load every existing book in the file up front instead of one query per row.
+        # in_bulk() splits the serials into batches under the backend's bound-parameter
+        # limit (999 on SQLite). Only the imported columns are fetched; bulk_update writes exactly those.
+        self._existing_books = Book.objects.only('id', *self._meta.fields).in_bulk(
+            list(set(dataset['serial'])), field_name='serial'
+        )
+        
+        return super().before_import(dataset, *args, **kwargs)
+    
+    def get_instance(self, instance_loader, row):
+        """Look up the existing book in the cache built by before_import"""
+        existing_books = getattr(self, '_existing_books', None)
+        if existing_books is None:
+            return super().get_instance(instance_loader, row)
+        return existing_books.get(row.get('serial'))
+    
+    def after_import(self, dataset, result, *args, **kwargs):
+        self._existing_books = None
+        # Bulk saves skip post_save, so retire the cached dashboard counts here
+        bump_dashboard_version()
+        return super().after_import(dataset, result, *args, **kwargs)
+    
+    def bulk_create(self, using_transactions, dry_run, raise_errors, batch_size=None, result=None):
+        """Stream the pending new books to PostgreSQL with COPY instead of multi-row INSERTs"""
+        # Dry runs (the admin preview) keep the stock path, which never writes without a transaction
+        if dry_run or connection.vendor != 'postgresql' or not self.create_instances:
+            return super().bulk_create(using_transactions, dry_run, raise_errors, batch_size=batch_size, result=result)
         
-        def clean_numeric(value):
-            """Clean numeric values, handling NaN"""
-            if pd.isna(value) or value == 'NaN' or str(value).strip() == '':
-                return None
-            try:
-                return int(float(value))
-            except (ValueError, TypeError):
-                return None
+        try:
+            # A savepoint keeps the import transaction usable if COPY hits a duplicate serial, isbn or barcode
+            with transaction.atomic():
+                self._copy_books(self.create_instances)
+        except Exception as e:
+            self.handle_import_error(result, e, raise_errors)
+        finally:
+            self.create_instances.clear()
+    
+    def _copy_books(self, books):
+        fields = [field for field in Book._meta.concrete_fields if not field.primary_key]
+        # date_added and last_updated share one timestamp instead of calling timezone.now() per book
+        now = timezone.now()
+        for field in fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                for book in books:
+                    setattr(book, field.attname, now)
         
-        def clean_date(value):
-            """Clean date values, handling various formats"""
-            if pd.isna(value) or value == 'NaN' or str(value).strip() == '':
-                return None
-            try:
-                # Try to parse various date formats
-                date_str = str(value).strip()
-                if len(date_str) == 4 and date_str.isdigit():  # Just year
-                    return f"{date_str}-01-01"
-                return date_str
-            except:
-                return None
+        buffer = StringIO()
+        for book in books:
+            values = (field.get_db_prep_save(field.value_from_object(book), connection) for field in fields)
+            # Unquoted empty values are NULL in COPY's CSV format, quoted ones are empty strings
+            buffer.write(','.join(
+                '' if value is None else '"%s"' % str(value).replace('"', '""')
+                for value in values
+            ))
+            buffer.write('\n')
+        buffer.seek(0)
         
-        # Map Excel columns to model fields with cleaning
-        if 'Title' in row:
-            row['title'] = clean_value(row['Title'])
-        if 'Author' in row:
-            row['author'] = clean_value(row['Author'])
-        if 'ISBN' in row:
-            row['isbn'] = clean_value(row['ISBN'])
-        if 'Publisher' in row:
-            row['publisher'] = clean_value(row['Publisher'])
-        if 'Edition' in row:
-            row['edition'] = clean_value(row['Edition'])
-        if 'Pages' in row:
-            row['pages'] = clean_numeric(row['Pages'])
-        if 'Language' in row:
-            language = clean_value(row['Language'])
-            # Map common language values to our choices
-            if language:
-                language_lower = language.lower()
-                if 'english' in language_lower or 'en' == language_lower:
-                    row['language'] = 'en'
-                elif 'arabic' in language_lower or 'ar' == language_lower:
-                    row['language'] = 'ar'
-                elif 'french' in language_lower or 'fr' == language_lower:
-                    row['language'] = 'fr'
-                elif 'spanish' in language_lower or 'es' == language_lower:
-                    row['language'] = 'es'
-                elif 'german' in language_lower or 'de' == language_lower:
-                    row['language'] = 'de'
-                else:
-                    row['language'] = 'other'
-            else:
-                row['language'] = 'en'  # Default to English
-        if 'Dewey_Code' in row:
-            row['dewey_code'] = clean_value(row['Dewey_Code'])
-        if 'Main_Class' in row:
-            row['main_class'] = clean_value(row['Main_Class'])
-        if 'Divisions' in row:
-            row['divisions'] = clean_value(row['Divisions'])
-        if 'Sections' in row:
-            row['sections'] = clean_value(row['Sections'])
-        if 'Cutter_Author' in row:
-            row['cutter_author'] = clean_value(row['Cutter_Author'])
-        if 'Volume' in row:
-            row['volume'] = clean_value(row['Volume'])
-        if 'Series' in row:
-            row['series'] = clean_value(row['Series'])
-        if 'Editor' in row:
-            row['editor'] = clean_value(row['Editor'])
-        if 'Translator' in row:
-            row['translator'] = clean_value(row['Translator'])
-        if 'Place_of_Publication' in row:
-            row['place_of_publication'] = clean_value(row['Place_of_Publication'])
-        if 'website' in row:
-            row['website'] = clean_value(row['website'])
-        if 'Source' in row:
-            row['source'] = clean_value(row['Source'])
-        if 'Cover_Type' in row:
-            cover_type = clean_value(row['Cover_Type'])
-            # Map to our choices
-            if cover_type:
-                cover_lower = cover_type.lower()
-                if 'hard' in cover_lower:
-                    row['cover_type'] = 'hardcover'
-                elif 'paper' in cover_lower or 'soft' in cover_lower:
-                    row['cover_type'] = 'paperback'
-                elif 'spiral' in cover_lower:
-                    row['cover_type'] = 'spiral'
-                elif 'digital' in cover_lower:
-                    row['cover_type'] = 'digital'
-                else:
-                    row['cover_type'] = 'paperback'  # Default
-            else:
-                row['cover_type'] = 'paperback'
-        if 'Condition' in row:
-            condition = clean_value(row['Condition'])
-            # Map to our choices
-            if condition:
-                condition_lower = condition.lower()
-                if 'excellent' in condition_lower:
-                    row['condition'] = 'excellent'
-                elif 'good' in condition_lower:
-                    row['condition'] = 'good'
-                elif 'fair' in condition_lower:
-                    row['condition'] = 'fair'
-                elif 'poor' in condition_lower:
-                    row['condition'] = 'poor'
-                elif 'damaged' in condition_lower:
-                    row['condition'] = 'damaged'
-                else:
-                    row['condition'] = 'good'  # Default
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        sql = f'COPY {connection.ops.quote_name(Book._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)'
+        with connection.cursor() as cursor:
+            if hasattr(cursor, 'copy_expert'):
+                # psycopg2
+                cursor.copy_expert(sql, buffer)
             else:
-                row['condition'] = 'good'
-        if 'Copy' in row:
-            row['copy_number'] = clean_numeric(row['Copy']) or 1
-        if 'Book_Summary' in row:
-            row['book_summary'] = clean_value(row['Book_Summary'])
-        if 'Contents' in row:
-            row['contents'] = clean_value(row['Contents'])
-        if 'Keywords' in row:
-            row['keywords'] = clean_value(row['Keywords'])
-        if 'Publication_Datte' in row:
-            # Handle the typo in the Excel file
-            row['publication_date'] = clean_date(row['Publication_Datte'])
-        
-        # Handle serial and shelf
-        if 'serial' in row:
-            row['serial'] = str(row['serial']) if row['serial'] and not pd.isna(row['serial']) else ''
-        if 'shelf' in row:
-            row['shelf'] = str(row['shelf']) if row['shelf'] and not pd.isna(row['shelf']) else ''
-            
-        # Set default values for required fields
-        if not row.get('title') or row.get('title') == 'None':
-            row['title'] = 'Unknown Title'
-        if not row.get('author') or row.get('author') == 'None':
-            row['author'] = 'Unknown Author'
-            
-        # Ensure serial is unique and not empty
-        if not row.get('serial') or row.get('serial') == 'None':
-            import time
-            row['serial'] = f"AUTO_{int(time.time())}_{row.get('title', 'book')[:10]}"
-            
-        return row
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
     
     class Meta:
         model = Book
@@ -182,10 +151,15 @@ class BookResource(resources.ModelResource):
         )
         skip_unchanged = True
         report_skipped = True
+        # Save rows with bulk_create/bulk_update in batches instead of one save() per row
+        use_bulk = True
+        batch_size = 1000
+        use_transactions = True
 
 class BookAdmin(ImportExportModelAdmin):
     resource_class = BookResource
     list_display = ['title', 'author', 'isbn', 'barcode', 'is_available', 'date_added']
+    show_full_result_count = False
     list_filter = ['is_available', 'language', 'condition', 'date_added']
     search_fields = ['title', 'author', 'isbn', 'barcode', 'keywords']
     readonly_fields = ['date_added', 'last_updated']
@@ -212,6 +186,36 @@ class BookAdmin(ImportExportModelAdmin):
             'fields': ('is_available', 'date_added', 'last_updated')
         }),
     )
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # The changelist only shows short columns; the change form and exports still need the rest
+        if _is_changelist(request, self.model):
+            queryset = queryset.defer('book_summary', 'contents', 'keywords', 'cover_image')
+        return queryset
+    
+    def get_import_formats(self):
+        """Read uploaded workbooks with ReadOnlyXLSX, keeping the other configured formats"""
+        return [ReadOnlyXLSX if fmt is base_formats.XLSX else fmt for fmt in super().get_import_formats()]
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Use the pg_trgm index for text search on PostgreSQL, icontains elsewhere"""
+        if not search_term or connection.vendor != 'postgresql':
+            return super().get_search_results(request, queryset, search_term)
+        
+        # Word similarity scores the term against the best matching part of the
+        # column, so a single word still finds long titles and keyword lists
+        search_term = search_term.strip()
+        queryset = queryset.filter(
+            Q(title__trigram_word_similar=search_term) |
+            Q(author__trigram_word_similar=search_term) |
+            Q(keywords__trigram_word_similar=search_term) |
+            # Exact codes use the unique btree indexes, so every arm is indexed
+            # and PostgreSQL can combine them instead of scanning the table
+            Q(isbn=search_term) |
+            Q(barcode=search_term)
+        )
+        return queryset, False
 
 admin.site.register(Book, BookAdmin)
 
@@ -223,40 +227,128 @@ class BorrowerResource(resources.ModelResource):
 class BorrowerAdmin(ImportExportModelAdmin):
     resource_class = BorrowerResource
     list_display = ['book', 'borrower', 'borrow_date', 'due_date', 'status', 'fine_amount']
+    show_full_result_count = False
+    list_select_related = ('book', 'borrower__user')
     list_filter = ['status', 'borrow_date', 'due_date']
     search_fields = ['book__title', 'borrower__user__username', 'borrower__user__email']
     readonly_fields = ['borrow_date']
+    autocomplete_fields = ('book', 'borrower')
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # Only load the columns list_display and the related __str__ methods read
+        if _is_changelist(request, self.model):
+            queryset = queryset.only(
+                'book', 'book__title',
+                'borrower', 'borrower__user',
+                'borrower__user__username', 'borrower__user__first_name', 'borrower__user__last_name',
+                'borrow_date', 'due_date', 'status', 'fine_amount'
+            )
+        return queryset
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Match the trigger-maintained search_vector on PostgreSQL, icontains elsewhere"""
+        if not search_term or connection.vendor != 'postgresql':
+            return super().get_search_results(request, queryset, search_term)
+        
+        # Every word is matched as a prefix so type-ahead in the autocomplete keeps working
+        terms = [term for term in TSQUERY_SPECIAL.split(search_term) if term]
+        if not terms:
+            return super().get_search_results(request, queryset, search_term)
+        
+        matches = queryset.filter(id__in=RawSQL(
+            "SELECT id FROM books_borrower WHERE search_vector @@ to_tsquery('simple', %s)",
+            [' & '.join(f'{term}:*' for term in terms)],
+        ))
+        if not matches.exists():
+            # Mid-word fragments, such as part of an email domain, need the plain icontains search
+            return super().get_search_results(request, queryset, search_term)
+        return matches, False
 
 admin.site.register(Borrower, BorrowerAdmin)
 
 
 class BorrowRequestAdmin(admin.ModelAdmin):
-    list_display = ['book', 'requester', 'request_date', 'requested_duration_days', 'status', 'processed_by', 'action_buttons']
+    list_display = ['book', 'requester', 'request_date', 'requested_duration_days', 'status', 'processed_by']
+    show_full_result_count = False
+    list_select_related = ('book', 'requester__user', 'processed_by__user')
     list_filter = ['status', 'request_date', 'processed_date']
     search_fields = ['book__title', 'requester__user__username', 'requester__user__email']
-    readonly_fields = ['request_date', 'processed_date']
+    readonly_fields = ['request_date', 'processed_date', 'action_buttons']
+    autocomplete_fields = ('book', 'requester', 'processed_by')
     fieldsets = (
         ('Request Information', {
             'fields': ('book', 'requester', 'request_date', 'requested_duration_days', 'notes')
         }),
         ('Status', {
-            'fields': ('status', 'admin_notes', 'processed_by', 'processed_date')
+            'fields': ('status', 'admin_notes', 'processed_by', 'processed_date', 'action_buttons')
         }),
     )
     
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # Only load the columns list_display and the related __str__ methods read
+        if _is_changelist(request, self.model):
+            queryset = queryset.only(
+                'book', 'book__title',
+                'requester', 'requester__user',
+                'requester__user__username', 'requester__user__first_name', 'requester__user__last_name',
+                'processed_by', 'processed_by__user',
+                'processed_by__user__username', 'processed_by__user__first_name', 'processed_by__user__last_name',
+                'request_date', 'requested_duration_days', 'status'
+            )
+        return queryset
+    
     def action_buttons(self, obj):
+        if obj is None or obj.pk is None:
+            return '-'
         if obj.status == 'pending':
-            approve_url = reverse('admin:approve_borrow_request', args=[obj.pk])
-            deny_url = reverse('admin:deny_borrow_request', args=[obj.pk])
+            approve_url = _url_template('books:approve_borrow_request').format(obj.pk)
+            deny_url = _url_template('books:deny_borrow_request').format(obj.pk)
             return format_html(
                 '<a class="button" href="{}">Approve</a>&nbsp;'
                 '<a class="button" href="{}">Deny</a>',
                 approve_url, deny_url
             )
-        return f"Status: {obj.get_status_display()}"
+        return f"Status: {REQUEST_STATUS_LABELS.get(obj.status, obj.status)}"
     action_buttons.short_description = 'Actions'
     action_buttons.allow_tags = True
     
+    actions = ['approve_selected', 'deny_selected']
+    
+    def approve_selected(self, request, queryset):
+        """Approve pending requests the same way the approve view does, oldest first"""
+        processed_by = getattr(request.user, 'userprofileinfo', None)
+        request_ids = list(queryset.values_list('id', flat=True))
+        approved = []
+        
+        with transaction.atomic():
+            # Lock the requests and their books so the approve view can't lend the same copy at the same time
+            pending = BorrowRequest.objects.select_for_update().select_related('book', 'requester').filter(
+                id__in=request_ids, status='pending'
+            ).order_by('request_date')
+            lent_books = set()
+            for borrow_request in pending:
+                # Only the oldest pending request for each available book can be approved
+                if not borrow_request.book.is_available or borrow_request.book_id in lent_books:
+                    continue
+                borrow_request.approve(processed_by=processed_by)
+                lent_books.add(borrow_request.book_id)
+                approved.append(borrow_request)
+        
+        self.message_user(request, f'{len(approved)} borrow request(s) approved.')
+    approve_selected.short_description = 'Approve selected borrow requests'
+    
+    def deny_selected(self, request, queryset):
+        """Deny pending requests with a single UPDATE"""
+        denied = queryset.filter(status='pending').update(
+            status='denied',
+            processed_by=getattr(request.user, 'userprofileinfo', None),
+            processed_date=Now()
+        )
+        self.message_user(request, f'{denied} borrow request(s) denied.')
+    deny_selected.short_description = 'Deny selected borrow requests'
+    
     def save_model(self, request, obj, form, change):
         if change and 'status' in form.changed_data:
             obj.processed_by = request.user.userprofileinfo
@@ -267,25 +359,32 @@ admin.site.register(BorrowRequest, BorrowRequestAdmin)
 
 
 class ReturnRequestAdmin(admin.ModelAdmin):
-    list_display = ['borrowing', 'requester', 'request_date', 'status', 'processed_by', 'action_buttons']
+    list_display = ['borrowing', 'requester', 'request_date', 'status', 'processed_by']
+    show_full_result_count = False
+    list_select_related = ('borrowing__book', 'borrowing__borrower__user', 'requester__user', 'processed_by__user')
     list_filter = ['status', 'request_date', 'processed_date']
     search_fields = ['borrowing__book__title', 'requester__user__username', 'requester__user__email']
-    readonly_fields = ['request_date', 'processed_date']
+    readonly_fields = ['request_date', 'processed_date', 'action_buttons']
+    autocomplete_fields = ('borrowing', 'requester', 'processed_by')
     fieldsets = (
         ('Request Information', {
             'fields': ('borrowing', 'requester', 'request_date', 'notes')
         }),
         ('Status', {
-            'fields': ('status', 'admin_notes', 'processed_by', 'processed_date')
+            'fields': ('status', 'admin_notes', 'processed_by', 'processed_date', 'action_buttons')
         }),
     )
     
     def action_buttons(self, obj):
+        if obj is None or obj.pk is None:
+            return '-'
         if obj.status == 'pending':
+            approve_url = _url_template('books:approve_return_request').format(obj.pk)
+            deny_url = _url_template('books:deny_return_request').format(obj.pk)
             return format_html(
-                '<a class="button" href="/return-requests/{}/approve/">Approve</a>&nbsp;'
-                '<a class="button" href="/return-requests/{}/deny/">Deny</a>',
-                obj.pk, obj.pk
+                '<a class="button" href="{}">Approve</a>&nbsp;'
+                '<a class="button" href="{}">Deny</a>',
+                approve_url, deny_url
             )
         return '-'
     action_buttons.short_description = 'Actions'
@@ -0,0 +1,177 @@
+import uuid
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+
+# Lowercased keyword found in the cell -> model choice; the first keyword
+# in each map that the cell contains wins, so the order sets the priority
+LANGUAGE_MAP = {
+    'english': 'en',
+    'arabic': 'ar',
+    'french': 'fr',
+    'spanish': 'es',
+    'german': 'de',
+}
+LANGUAGE_CODES = {code: code for code in LANGUAGE_MAP.values()}
+
+COVER_TYPE_MAP = {
+    'hard': 'hardcover',
+    'paper': 'paperback',
+    'soft': 'paperback',
+    'spiral': 'spiral',
+    'digital': 'digital',
+}
+
+CONDITION_MAP = {
+    'excellent': 'excellent',
+    'good': 'good',
+    'fair': 'fair',
+    'poor': 'poor',
+    'damaged': 'damaged',
+}
+
+# Accepted publication date formats, tried in order; a bare year means January 1st.
+# Slashed dates are month first, as the import widget read them before
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y')
+
+
+def _clean_text(series):
+    """Clean a column of values, turning NaN and empty strings into missing values"""
+    present = series.notna() & (series != 'NaN')
+    text = series[present]
+    if pd.api.types.infer_dtype(text, skipna=True) != 'string':
+        # Only stringify columns that hold numbers, dates or mixed values
+        text = text.astype(str)
+    text = text.str.strip()
+    return text[text != ''].reindex(series.index)
+
+
+def _clean_numeric(series):
+    """Clean a column of numeric values, truncating floats to integers"""
+    # Cells openpyxl already read as numbers convert directly; only the rest go through text cleaning
+    numeric = pd.to_numeric(series, errors='coerce')
+    retry = numeric.isna() & series.notna()
+    if retry.any():
+        numeric[retry] = pd.to_numeric(_clean_text(series[retry]), errors='coerce')
+    return np.trunc(numeric).astype('Int64')
+
+
+def _clean_date(series):
+    """Parse a column of date values to dates, leaving unparseable text for the widget to report"""
+    # Real Excel date cells arrive as datetimes; keep their date instead of parsing their text
+    series = series.astype(object)
+    is_date = series.notna() & series.map(lambda value: isinstance(value, date))
+    dates = series[is_date].map(lambda value: value.date() if isinstance(value, datetime) else value)
+    text = _clean_text(series.where(~is_date))
+    parsed = pd.Series(pd.NaT, index=text.index)
+    for date_format in DATE_FORMATS:
+        # to_datetime caches repeated strings, so each distinct date is parsed once
+        parsed = parsed.fillna(pd.to_datetime(text, format=date_format, errors='coerce'))
+    return parsed.dt.date.where(parsed.notna(), text).where(~is_date, dates)
+
+
+def _match_keywords(text, mapping):
+    """Map each value to the choice of the first keyword in mapping that it contains"""
+    conditions = [text.str.contains(keyword, regex=False, na=False) for keyword in mapping]
+    return pd.Series(np.select(conditions, list(mapping.values()), default=None), index=text.index)
+
+
+def _clean_copy_number(series):
+    """Clean a column of copy numbers, defaulting missing or zero values to 1"""
+    return _clean_numeric(series).replace(0, pd.NA).fillna(1)
+
+
+def _clean_language(series):
+    """Map free-text languages to our choices, 'other' if unknown and 'en' if empty"""
+    language = _clean_text(series).str.lower()
+    mapped = _match_keywords(language, LANGUAGE_MAP)
+    mapped = mapped.fillna(language.map(LANGUAGE_CODES))
+    return mapped.fillna('other').where(language.notna(), 'en')
+
+
+def _clean_cover_type(series):
+    """Map free-text cover types to our choices, defaulting to paperback"""
+    cover_type = _clean_text(series).str.lower()
+    return _match_keywords(cover_type, COVER_TYPE_MAP).fillna('paperback')
+
+
+def _clean_condition(series):
+    """Map free-text conditions to our choices, defaulting to good"""
+    condition = _clean_text(series).str.lower()
+    return _match_keywords(condition, CONDITION_MAP).fillna('good')
+
+
+# (Excel column, model field, cleaner) applied to the whole column on import
+COLUMN_MAP = (
+    ('Title', 'title', _clean_text),
+    ('Author', 'author', _clean_text),
+    ('ISBN', 'isbn', _clean_text),
+    ('Publisher', 'publisher', _clean_text),
+    ('Edition', 'edition', _clean_text),
+    ('Pages', 'pages', _clean_numeric),
+    ('Language', 'language', _clean_language),
+    ('Dewey_Code', 'dewey_code', _clean_text),
+    ('Main_Class', 'main_class', _clean_text),
+    ('Divisions', 'divisions', _clean_text),
+    ('Sections', 'sections', _clean_text),
+    ('Cutter_Author', 'cutter_author', _clean_text),
+    ('Volume', 'volume', _clean_text),
+    ('Series', 'series', _clean_text),
+    ('Editor', 'editor', _clean_text),
+    ('Translator', 'translator', _clean_text),
+    ('Place_of_Publication', 'place_of_publication', _clean_text),
+    ('website', 'website', _clean_text),
+    ('Source', 'source', _clean_text),
+    ('Cover_Type', 'cover_type', _clean_cover_type),
+    ('Condition', 'condition', _clean_condition),
+    ('Copy', 'copy_number', _clean_copy_number),
+    ('Book_Summary', 'book_summary', _clean_text),
+    ('Contents', 'contents', _clean_text),
+    ('Keywords', 'keywords', _clean_text),
+    # The typo matches the column name in the Excel template
+    ('Publication_Datte', 'publication_date', _clean_date),
+)
+
+# Values used when a required field is empty
+REQUIRED_DEFAULTS = {
+    'title': 'Unknown Title',
+    'author': 'Unknown Author',
+}
+
+
+def clean_book_dataset(dataset):
+    """Clean and map the whole dataset in one pandas pass, in place"""
+    # Build the frame from the row tuples; dataset.dict would copy every row into a dict first
+    df = pd.DataFrame(list(dataset), columns=dataset.headers)
+    
+    # Map Excel columns to model fields with cleaning
+    for source, field, clean in COLUMN_MAP:
+        if source in df:
+            df[field] = clean(df[source])
+    
+    # Handle serial and shelf
+    for column in ('serial', 'shelf'):
+        if column in df:
+            present = df[column].notna() & df[column].astype(bool)
+            df[column] = df[column].where(present, '').astype(str)
+    
+    # Set default values for required fields
+    for field, default in REQUIRED_DEFAULTS.items():
+        if field not in df:
+            df[field] = None
+        missing = df[field].isna() | df[field].isin(['', 'None'])
+        df.loc[missing, field] = default
+    
+    # Ensure serial is unique and not empty
+    if 'serial' not in df:
+        df['serial'] = None
+    missing = df['serial'].isna() | df['serial'].isin(['', 'None'])
+    if missing.any():
+        # 'AUTO_' + 15 hex digits fits the 20-character serial column
+        df.loc[missing, 'serial'] = [f'AUTO_{uuid.uuid4().hex[:15]}' for _ in range(missing.sum())]
+    
+    df = df.astype(object).where(df.notna(), None)
+    dataset.wipe()
+    dataset.headers = list(df.columns)
+    dataset.extend(df.itertuples(index=False, name=None))
@@ -2,18 +2,65 @@ from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
-from django.http import JsonResponse
-from django.db.models import Count, Q, Sum
+from django.http import HttpResponse, JsonResponse
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncMonth
 from django.db import models
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 import json
+import orjson
 
-from .decorators import librarian_required, LibrarianRequiredMixin, is_librarian, is_admin
+from .decorators import librarian_required, LibrarianRequiredMixin, is_librarian
 from .reports import LibraryReports
+from .signals import get_dashboard_version
 from .models import Book, Borrower, BookReservation
 from library_users.models import UserProfileinfo
 from django.shortcuts import redirect
 
+# Chart data is retired by the signals in books.signals; the timeout bounds how
+# long another process with its own local-memory cache can serve stale counts
+CHART_DATA_CACHE_TIMEOUT = 60 * 5
+
+# Rows per page of the financial report's outstanding fines list
+FINES_PAGE_SIZE = 50
+
+
+def _month_starts(count):
+    """First day of each of the last `count` calendar months, oldest first"""
+    month = date.today().replace(day=1)
+    months = []
+    for _ in range(count):
+        months.append(month)
+        month = (month - timedelta(days=1)).replace(day=1)
+    return months[::-1]
+
+
+def _monthly_totals(queryset, field, since, total=None):
+    """Aggregate rows per calendar month of a date field in one grouped query (row count by default)"""
+    rows = queryset.filter(**{f'{field}__gte': since}).annotate(
+        month=TruncMonth(field)
+    ).values('month').annotate(total=total or Count('id')).order_by()
+    totals = {}
+    for row in rows:
+        month = row['month']
+        if isinstance(month, datetime):
+            month = month.date()
+        totals[month] = row['total']
+    return totals
+
+
+def _count_books_by(field):
+    return list(Book.objects.values(field).annotate(count=Count('id')).order_by('-count'))
+
+
+def _book_facets():
+    """Book counts per language, main class and condition, largest first, cached until the data changes"""
+    return cache.get_or_set(f'dashboard_book_facets:{get_dashboard_version()}', lambda: {
+        field: _count_books_by(field) for field in ('language', 'main_class', 'condition')
+    }, CHART_DATA_CACHE_TIMEOUT)
+
 
 class DashboardView(TemplateView):
     """Public library dashboard with valuable information for everyone - no login required"""
@@ -23,8 +70,12 @@ class DashboardView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Public Library Statistics
-        total_books = Book.objects.count()
-        available_books = Book.objects.filter(is_available=True).count()
+        book_counts = Book.objects.aggregate(
+            total=Count('id'),
+            available=Count('id', filter=Q(is_available=True)),
+        )
+        total_books = book_counts['total']
+        available_books = book_counts['available']
         borrowed_books = total_books - available_books
         
         # Collection Statistics
@@ -37,22 +88,15 @@ class DashboardView(TemplateView):
         utilization_rate = round((borrowed_books / total_books * 100), 1) if total_books > 0 else 0
         
         # Get popular books (most borrowed)
-        popular_books = Book.objects.annotate(
-            borrow_count=Count('borrowings')
-        ).filter(borrow_count__gt=0).order_by('-borrow_count')[:10]
+        popular_books = LibraryReports.get_popular_books(10)
         
         # Get recently added books
-        recent_books = Book.objects.order_by('-date_added')[:8]
-        
-        # Get books by language distribution
-        language_stats = Book.objects.values('language').annotate(
-            count=Count('id')
-        ).order_by('-count')[:5]
+        recent_books = Book.objects.only('id', 'title', 'author', 'cover_image').order_by('-date_added')[:8]
         
-        # Get books by category/genre
-        category_stats = Book.objects.values('main_class').annotate(
-            count=Count('id')
-        ).order_by('-count')[:8]
+        # Get books by language and category/genre distribution
+        book_facets = _book_facets()
+        language_stats = book_facets['language'][:5]
+        category_stats = book_facets['main_class'][:8]
         
         # Library services and information
         library_info = {
@@ -81,19 +125,16 @@ class DashboardView(TemplateView):
         }
         
         # Reading statistics for public interest
-        from datetime import datetime
         today = date.today()
+        today_counts = Borrower.objects.filter(
+            Q(borrow_date=today) | Q(return_date=today)
+        ).aggregate(
+            borrowed=Count('id', filter=Q(borrow_date=today)),
+            returned=Count('id', filter=Q(return_date=today)),
+        )
         reading_stats = {
-            'books_borrowed_today': Borrower.objects.filter(
-                borrow_date__year=today.year,
-                borrow_date__month=today.month,
-                borrow_date__day=today.day
-            ).count(),
-            'books_returned_today': Borrower.objects.filter(
-                return_date__year=today.year,
-                return_date__month=today.month,
-                return_date__day=today.day
-            ).count(),
+            'books_borrowed_today': today_counts['borrowed'],
+            'books_returned_today': today_counts['returned'],
             'most_active_day': 'Monday',  # Could be calculated from data
             'average_books_per_user': round(total_books / total_users, 1) if total_users > 0 else 0
         }
@@ -116,7 +157,11 @@ class DashboardView(TemplateView):
             'category_stats': category_stats,
             
             # Charts and Analytics
-            'chart_data': self.get_chart_data(),
+            'chart_data': cache.get_or_set(
+                f'dashboard_chart_data:{get_dashboard_version()}',
+                self.get_chart_data,
+                CHART_DATA_CACHE_TIMEOUT
+            ),
             
             # Public access flag
             'is_public_dashboard': True,
@@ -126,25 +171,24 @@ class DashboardView(TemplateView):
     
     def get_chart_data(self):
         """Prepare comprehensive data for charts and analytics"""
-        # Books by language chart
-        books_by_language = Book.objects.values('language').annotate(
-            count=Count('id')
-        ).order_by('-count')[:8]
+        # Books by language chart, sharing the facet counts with the dashboard context
+        book_facets = _book_facets()
+        books_by_language = book_facets['language'][:8]
         
-        # Monthly borrowings for the last 12 months
-        monthly_data = []
-        for i in range(12):
-            target_date = date.today().replace(day=1) - timedelta(days=i*30)
-            month_stats = LibraryReports.get_monthly_statistics(
-                target_date.year, target_date.month
-            )
-            monthly_data.append({
-                'month': target_date.strftime('%b %Y'),
-                'borrowings': month_stats['monthly_borrowings'],
-                'returns': month_stats['monthly_returns'],
-                'new_users': month_stats['new_users'],
-                'new_books': month_stats['new_books']
-            })
+        # Monthly borrowings for the last 12 months, one grouped query per series
+        months = _month_starts(12)
+        since = months[0]
+        borrowings = _monthly_totals(Borrower.objects.all(), 'borrow_date', since)
+        returns = _monthly_totals(Borrower.objects.all(), 'return_date', since)
+        new_users = _monthly_totals(UserProfileinfo.objects.all(), 'membership_date', since)
+        new_books = _monthly_totals(Book.objects.all(), 'date_added', since)
+        monthly_data = [{
+            'month': month.strftime('%b %Y'),
+            'borrowings': borrowings.get(month, 0),
+            'returns': returns.get(month, 0),
+            'new_users': new_users.get(month, 0),
+            'new_books': new_books.get(month, 0)
+        } for month in months]
         
         # User type distribution
         user_types = UserProfileinfo.objects.values('user_type').annotate(
@@ -152,69 +196,62 @@ class DashboardView(TemplateView):
         ).order_by('-count')
         
         # Books by genre/category (using main_class as category)
-        books_by_category = Book.objects.values('main_class').annotate(
-            count=Count('id')
-        ).order_by('-count')[:10]
+        books_by_category = book_facets['main_class'][:10]
         
-        # Reading trends - books borrowed by month
-        reading_trends = []
-        for i in range(6):
-            target_date = date.today().replace(day=1) - timedelta(days=i*30)
-            borrowings_count = Borrower.objects.filter(
-                borrow_date__year=target_date.year,
-                borrow_date__month=target_date.month
-            ).count()
-            reading_trends.append({
-                'month': target_date.strftime('%b'),
-                'count': borrowings_count
-            })
+        # Reading trends - books borrowed by month, reusing the monthly counts
+        reading_trends = [{
+            'month': month.strftime('%b'),
+            'count': borrowings.get(month, 0)
+        } for month in months[-6:]]
         
         # Popular authors (top 10)
-        popular_authors = Book.objects.values('author').annotate(
-            borrow_count=Count('borrowings')
-        ).filter(borrow_count__gt=0).order_by('-borrow_count')[:10]
+        popular_authors = Book.objects.filter(times_borrowed__gt=0).values('author').annotate(
+            borrow_count=Sum('times_borrowed')
+        ).order_by('-borrow_count')[:10]
         
         # Book condition distribution
-        book_conditions = Book.objects.values('condition').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        book_conditions = book_facets['condition']
         
-        # Weekly activity (last 4 weeks)
-        weekly_activity = []
-        for i in range(4):
-            week_start = date.today() - timedelta(days=(i+1)*7)
-            week_end = week_start + timedelta(days=6)
-            
-            weekly_borrowings = Borrower.objects.filter(
-                borrow_date__range=[week_start, week_end]
-            ).count()
-            
-            weekly_returns = Borrower.objects.filter(
-                return_date__range=[week_start, week_end]
-            ).count()
-            
-            weekly_activity.append({
-                'week': f'Week {4-i}',
-                'borrowings': weekly_borrowings,
-                'returns': weekly_returns
-            })
+        # Weekly activity (last 4 weeks), every window counted in one aggregate
+        today = date.today()
+        weeks = [(today - timedelta(days=(i+1)*7), today - timedelta(days=(i+1)*7 - 6)) for i in range(4)]
+        week_counts = Borrower.objects.filter(
+            Q(borrow_date__range=[weeks[-1][0], weeks[0][1]]) | Q(return_date__range=[weeks[-1][0], weeks[0][1]])
+        ).aggregate(**{
+            f'{kind}_{i}': Count('id', filter=Q(**{f'{field}__range': [week_start, week_end]}))
+            for i, (week_start, week_end) in enumerate(weeks)
+            for kind, field in (('borrowings', 'borrow_date'), ('returns', 'return_date'))
+        })
+        weekly_activity = [{
+            'week': f'Week {4-i}',
+            'borrowings': week_counts[f'borrowings_{i}'],
+            'returns': week_counts[f'returns_{i}']
+        } for i in range(4)]
         
         # User engagement metrics
-        total_users = UserProfileinfo.objects.filter(status='active').count()
-        users_with_books = UserProfileinfo.objects.filter(current_books_count__gt=0).count()
+        user_counts = UserProfileinfo.objects.aggregate(
+            active=Count('id', filter=Q(status='active')),
+            with_books=Count('id', filter=Q(current_books_count__gt=0)),
+        )
+        total_users = user_counts['active']
+        users_with_books = user_counts['with_books']
         engagement_rate = (users_with_books / max(total_users, 1)) * 100
         
         # Reading completion rate
-        total_borrowings = Borrower.objects.count()
-        completed_borrowings = Borrower.objects.filter(status='returned').count()
+        borrowing_counts = Borrower.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='returned')),
+        )
+        total_borrowings = borrowing_counts['total']
+        completed_borrowings = borrowing_counts['completed']
         completion_rate = (completed_borrowings / max(total_borrowings, 1)) * 100
         
         return {
             'books_by_language': list(books_by_language),
-            'monthly_borrowings': list(reversed(monthly_data)),
+            'monthly_borrowings': monthly_data,
             'user_types': list(user_types),
             'books_by_category': list(books_by_category),
-            'reading_trends': list(reversed(reading_trends)),
+            'reading_trends': reading_trends,
             'popular_authors': list(popular_authors),
             'book_conditions': list(book_conditions),
             'weekly_activity': list(reversed(weekly_activity)),
@@ -255,43 +292,51 @@ def analytics_api(request):
             'borrow_count': book.borrow_count
         } for book in books]
     elif report_type == 'overdue':
-        overdue = LibraryReports.get_overdue_books()
+        # Read plain rows; the report never needs the model instances
+        overdue = LibraryReports.get_overdue_books().values(
+            'due_date', 'book__title', 'borrower__user__first_name', 'borrower__user__last_name'
+        )
+        today = date.today()
         data = [{
-            'book_title': borrowing.book.title,
-            'borrower': borrowing.borrower.user.get_full_name(),
-            'due_date': borrowing.due_date.isoformat(),
-            'days_overdue': (date.today() - borrowing.due_date).days
-        } for borrowing in overdue]
+            'book_title': row['book__title'],
+            # Same as User.get_full_name()
+            'borrower': f"{row['borrower__user__first_name']} {row['borrower__user__last_name']}".strip(),
+            'due_date': row['due_date'].isoformat(),
+            'days_overdue': (today - row['due_date']).days
+        } for row in overdue]
     elif report_type == 'monthly':
         year = int(request.GET.get('year', date.today().year))
         month = int(request.GET.get('month', date.today().month))
         data = LibraryReports.get_monthly_statistics(year, month)
     else:
-        data = {'error': 'Invalid report type'}
+        return JsonResponse({'error': 'Invalid report type'})
     
-    return JsonResponse(data, safe=False)
+    # orjson encodes straight to bytes; str() covers Decimal fines like DjangoJSONEncoder does
+    return HttpResponse(orjson.dumps(data, default=str), content_type='application/json')
 
 
 @librarian_required
 def user_activity_report(request):
     """User activity report"""
-    # Most active users (by borrowing count)
-    active_users = UserProfileinfo.objects.annotate(
-        total_borrowings=Count('borrowed_books')
-    ).filter(
-        total_borrowings__gt=0
+    # Most active users (by borrowing count); group the borrowings first so only the top 20 profiles are loaded
+    top_borrowers = Borrower.objects.values('borrower').annotate(
+        total_borrowings=Count('id')
     ).order_by('-total_borrowings')[:20]
+    borrowing_counts = {row['borrower']: row['total_borrowings'] for row in top_borrowers}
+    active_users = list(UserProfileinfo.objects.filter(id__in=borrowing_counts).select_related('user'))
+    for user_profile in active_users:
+        user_profile.total_borrowings = borrowing_counts[user_profile.id]
+    active_users.sort(key=lambda user_profile: user_profile.total_borrowings, reverse=True)
     
     # Users with overdue books
-    users_with_overdue = UserProfileinfo.objects.filter(
-        borrowed_books__due_date__lt=date.today(),
-        borrowed_books__status='borrowed'
-    ).distinct()
+    users_with_overdue = UserProfileinfo.objects.filter(Exists(
+        Borrower.objects.filter(borrower=OuterRef('pk'), status='borrowed', due_date__lt=date.today())
+    )).select_related('user')
     
     # Users with highest fines
     users_with_fines = UserProfileinfo.objects.filter(
         total_fines__gt=0
-    ).order_by('-total_fines')[:10]
+    ).select_related('user').order_by('-total_fines')[:10]
     
     context = {
         'active_users': active_users,
@@ -308,10 +353,10 @@ def book_usage_report(request):
     # Most popular books
     popular_books = LibraryReports.get_popular_books(50)
     
-    # Least popular books (never borrowed)
-    unpopular_books = Book.objects.annotate(
-        borrow_count=Count('borrowings')
-    ).filter(borrow_count=0)[:20]
+    # Least popular books (never borrowed); NOT EXISTS stops at 20 instead of grouping every book
+    unpopular_books = Book.objects.filter(
+        ~Exists(Borrower.objects.filter(book=OuterRef('pk')))
+    )[:20]
     
     # Books by category/subject
     books_by_category = Book.objects.values('main_class').annotate(
@@ -343,32 +388,28 @@ def financial_report(request):
         total=models.Sum('fine_amount')
     )['total'] or 0
     
-    # Fines by month for the last 12 months
-    monthly_fines = []
-    for i in range(12):
-        target_date = date.today().replace(day=1) - timedelta(days=i*30)
-        month_fines = Borrower.objects.filter(
-            return_date__year=target_date.year,
-            return_date__month=target_date.month,
-            fine_amount__gt=0
-        ).aggregate(
-            total=models.Sum('fine_amount')
-        )['total'] or 0
-        
-        monthly_fines.append({
-            'month': target_date.strftime('%b %Y'),
-            'fines': float(month_fines)
-        })
+    # Fines by month for the last 12 months, in one grouped query
+    months = _month_starts(12)
+    fines = _monthly_totals(
+        Borrower.objects.filter(fine_amount__gt=0), 'return_date', months[0], total=Sum('fine_amount')
+    )
+    monthly_fines = [{
+        'month': month.strftime('%b %Y'),
+        'fines': float(fines.get(month) or 0)
+    } for month in months]
     
-    # Users with outstanding fines
+    # Users with outstanding fines, one page at a time
     users_with_fines = UserProfileinfo.objects.filter(
         total_fines__gt=0
-    ).order_by('-total_fines')
+    ).select_related('user').order_by('-total_fines', 'id')
+    page_obj = Paginator(users_with_fines, FINES_PAGE_SIZE).get_page(request.GET.get('page'))
     
     context = {
         'total_fines': total_fines,
-        'monthly_fines': list(reversed(monthly_fines)),
-        'users_with_fines': users_with_fines,
+        'monthly_fines': monthly_fines,
+        'users_with_fines': page_obj,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
     }
     
     return render(request, 'books/financial_report.html', context)
@@ -382,11 +423,20 @@ def user_dashboard(request):
     
     user_profile = request.user.userprofileinfo
     
-    # User's current borrowings
-    current_borrowings = Borrower.objects.filter(
+    # Calculate dates for template comparisons
+    today = date.today()
+    due_soon_date = today + timedelta(days=3)
+    
+    # Columns the dashboard cards show for a borrowing and its book
+    borrowing_fields = (
+        'id', 'status', 'borrow_date', 'due_date', 'return_date', 'book', 'book__title', 'book__author'
+    )
+    
+    # User's current borrowings, loaded once; a member only ever has a handful
+    current_borrowings = list(Borrower.objects.filter(
         borrower=user_profile,
         status='borrowed'
-    ).select_related('book')
+    ).select_related('book').only(*borrowing_fields))
     
     # User's reservations
     reservations = BookReservation.objects.filter(
@@ -397,18 +447,16 @@ def user_dashboard(request):
     # User's borrowing history
     borrowing_history = Borrower.objects.filter(
         borrower=user_profile
-    ).select_related('book').order_by('-borrow_date')[:10]
+    ).select_related('book').only(*borrowing_fields).order_by('-borrow_date')[:10]
     
     # Overdue books
-    overdue_books = current_borrowings.filter(
-        due_date__lt=date.today()
-    )
+    overdue_books = [borrowing for borrowing in current_borrowings if borrowing.due_date < today]
     
     # Books due soon
-    books_due_soon = current_borrowings.filter(
-        due_date__lte=date.today() + timedelta(days=3),
-        due_date__gte=date.today()
-    )
+    books_due_soon = [
+        borrowing for borrowing in current_borrowings
+        if today <= borrowing.due_date <= due_soon_date
+    ]
     
     # Calculate available books (max allowed minus currently borrowed)
     available_books = user_profile.max_books_allowed - user_profile.current_books_count
@@ -419,10 +467,6 @@ def user_dashboard(request):
     else:
         borrowing_percentage = 0
     
-    # Calculate dates for template comparisons
-    today = date.today()
-    due_soon_date = today + timedelta(days=3)
-    
     context = {
         'user_profile': user_profile,
         'current_borrowings': current_borrowings,
@@ -442,8 +486,8 @@ def user_dashboard(request):
 @login_required
 def dashboard_redirect(request):
     """Redirect users to appropriate dashboard based on their role"""
-    # Check if user is librarian or admin
-    if is_librarian(request.user) or is_admin(request.user):
+    # Check if user is librarian or admin (is_librarian already accepts library admins)
+    if is_librarian(request.user):
         # Redirect to admin dashboard
         return redirect('books:admin_dashboard')
     else:
@@ -5,28 +5,35 @@ from django.shortcuts import redirect
 from django.contrib import messages
 
 
+def _group_names(user):
+    """Load the user's group names once and keep them on the user for the rest of the request"""
+    if not hasattr(user, '_group_names'):
+        user._group_names = frozenset(user.groups.values_list('name', flat=True))
+    return user._group_names
+
+
 def user_in_group(group_name):
     """Check if user belongs to a specific group"""
     def check_group(user):
-        return user.groups.filter(name=group_name).exists()
+        return group_name in _group_names(user)
     return check_group
 
 
 def is_librarian(user):
     """Check if user is a librarian"""
     # Allow superusers and users in Librarian or Library Admin groups
-    return user.is_superuser or user.groups.filter(name__in=['Librarian', 'Library Admin']).exists()
+    return user.is_superuser or not _group_names(user).isdisjoint({'Librarian', 'Library Admin'})
 
 
 def is_admin(user):
     """Check if user is a library admin"""
     # Allow superusers and users in Library Admin group
-    return user.is_superuser or user.groups.filter(name='Library Admin').exists()
+    return user.is_superuser or 'Library Admin' in _group_names(user)
 
 
 def is_member(user):
     """Check if user is at least a member"""
-    return user.groups.filter(name__in=['Member', 'Librarian', 'Library Admin']).exists()
+    return not _group_names(user).isdisjoint({'Member', 'Librarian', 'Library Admin'})
 
 
 def librarian_required(view_func=None, redirect_url='/library_users/login/'):
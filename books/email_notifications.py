@@ -1,4 +1,4 @@
-from django.core.mail import send_mail, EmailMultiAlternatives
+from django.core.mail import send_mail, EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
@@ -14,7 +14,7 @@ class EmailNotificationService:
     """Service for sending email notifications to library users"""
     
     @staticmethod
-    def send_due_date_reminder(borrowing):
+    def send_due_date_reminder(borrowing, connection=None, inbox=None):
         """Send reminder email for books due soon"""
         try:
             user = borrowing.borrower.user
@@ -41,18 +41,23 @@ class EmailNotificationService:
                 subject=subject,
                 body=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
+                to=[user.email],
+                connection=connection
             )
             email.attach_alternative(html_message, "text/html")
             email.send()
             
-            # Create inbox message
-            InboxMessages.objects.create(
+            # Create inbox message, or leave it to the caller to save with the rest of its batch
+            inbox_message = InboxMessages(
                 recipient=borrowing.borrower,
                 message_type='reminder',
                 subject=subject,
                 message=f"Your book '{borrowing.book.title}' is due on {borrowing.due_date}. Please return it on time to avoid fines."
             )
+            if inbox is None:
+                inbox_message.save()
+            else:
+                inbox.append(inbox_message)
             
             logger.info(f"Due date reminder sent to {user.email} for book {borrowing.book.title}")
             return True
@@ -62,7 +67,7 @@ class EmailNotificationService:
             return False
     
     @staticmethod
-    def send_overdue_notification(borrowing):
+    def send_overdue_notification(borrowing, connection=None, inbox=None):
         """Send notification for overdue books"""
         try:
             user = borrowing.borrower.user
@@ -94,18 +99,23 @@ class EmailNotificationService:
                 subject=subject,
                 body=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
+                to=[user.email],
+                connection=connection
             )
             email.attach_alternative(html_message, "text/html")
             email.send()
             
-            # Create inbox message
-            InboxMessages.objects.create(
+            # Create inbox message, or leave it to the caller to save with the rest of its batch
+            inbox_message = InboxMessages(
                 recipient=borrowing.borrower,
                 message_type='alert',
                 subject=subject,
                 message=f"Your book '{borrowing.book.title}' is {days_overdue} days overdue. Fine: ${fine_amount:.2f}. Please return immediately."
             )
+            if inbox is None:
+                inbox_message.save()
+            else:
+                inbox.append(inbox_message)
             
             logger.info(f"Overdue notification sent to {user.email} for book {borrowing.book.title}")
             return True
@@ -115,7 +125,7 @@ class EmailNotificationService:
             return False
     
     @staticmethod
-    def send_reservation_available(reservation):
+    def send_reservation_available(reservation, connection=None):
         """Send notification when reserved book becomes available"""
         try:
             user = reservation.user.user
@@ -142,7 +152,8 @@ class EmailNotificationService:
                 subject=subject,
                 body=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
+                to=[user.email],
+                connection=connection
             )
             email.attach_alternative(html_message, "text/html")
             email.send()
@@ -163,7 +174,7 @@ class EmailNotificationService:
             return False
     
     @staticmethod
-    def send_reservation_expiry_warning(reservation):
+    def send_reservation_expiry_warning(reservation, connection=None, inbox=None):
         """Send warning when reservation is about to expire"""
         try:
             user = reservation.user.user
@@ -193,18 +204,23 @@ class EmailNotificationService:
                 subject=subject,
                 body=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
+                to=[user.email],
+                connection=connection
             )
             email.attach_alternative(html_message, "text/html")
             email.send()
             
-            # Create inbox message
-            InboxMessages.objects.create(
+            # Create inbox message, or leave it to the caller to save with the rest of its batch
+            inbox_message = InboxMessages(
                 recipient=reservation.user,
                 message_type='reminder',
                 subject=subject,
                 message=f"Your reservation for '{reservation.book.title}' expires in {days_until_expiry} days. Please collect the book soon."
             )
+            if inbox is None:
+                inbox_message.save()
+            else:
+                inbox.append(inbox_message)
             
             logger.info(f"Reservation expiry warning sent to {user.email} for book {reservation.book.title}")
             return True
@@ -214,7 +230,7 @@ class EmailNotificationService:
             return False
     
     @staticmethod
-    def send_welcome_email(user_profile):
+    def send_welcome_email(user_profile, connection=None):
         """Send welcome email to new library members"""
         try:
             user = user_profile.user
@@ -239,7 +255,8 @@ class EmailNotificationService:
                 subject=subject,
                 body=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
+                to=[user.email],
+                connection=connection
             )
             email.attach_alternative(html_message, "text/html")
             email.send()
@@ -260,7 +277,7 @@ class EmailNotificationService:
             return False
     
     @staticmethod
-    def send_book_return_confirmation(borrowing):
+    def send_book_return_confirmation(borrowing, connection=None):
         """Send confirmation email when book is returned"""
         try:
             user = borrowing.borrower.user
@@ -287,7 +304,8 @@ class EmailNotificationService:
                 subject=subject,
                 body=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
+                to=[user.email],
+                connection=connection
             )
             email.attach_alternative(html_message, "text/html")
             email.send()
@@ -303,6 +321,53 @@ class EmailNotificationService:
 class NotificationScheduler:
     """Scheduler for automated email notifications"""
     
+    @staticmethod
+    def send_batch(send, items):
+        """Send one notification per item, sharing an SMTP session between them, and return how many were sent"""
+        items = list(items)
+        if not items:
+            return 0
+        
+        sent_count = 0
+        failed_count = 0
+        inbox = []
+        connection = None
+        try:
+            for item in items:
+                if connection is None:
+                    try:
+                        connection = get_connection()
+                        connection.open()
+                    except Exception as e:
+                        logger.error(f"Failed to connect to the mail server: {str(e)}")
+                        connection = None
+                        failed_count += 1
+                        continue
+                
+                if send(item, connection=connection, inbox=inbox):
+                    sent_count += 1
+                else:
+                    failed_count += 1
+                    # The failure may have dropped the session, so the next email opens a fresh one
+                    NotificationScheduler.close_connection(connection)
+                    connection = None
+        finally:
+            if connection is not None:
+                NotificationScheduler.close_connection(connection)
+            # The inbox copies of the sent emails, saved together
+            InboxMessages.objects.bulk_create(inbox, batch_size=500)
+        
+        if failed_count:
+            logger.warning(f"{failed_count} of {len(items)} notifications could not be sent")
+        return sent_count
+    
+    @staticmethod
+    def close_connection(connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning(f"Failed to close the mail server connection: {str(e)}")
+    
     @staticmethod
     def send_daily_reminders():
         """Send daily reminders for books due soon (3 days before)"""
@@ -310,13 +375,11 @@ class NotificationScheduler:
         
         borrowings_due_soon = Borrower.objects.filter(
             due_date=reminder_date,
-            status='borrowed'
+            status='borrowed',
+            borrower__email_notifications=True
         ).select_related('borrower__user', 'book')
         
-        sent_count = 0
-        for borrowing in borrowings_due_soon:
-            if EmailNotificationService.send_due_date_reminder(borrowing):
-                sent_count += 1
+        sent_count = NotificationScheduler.send_batch(EmailNotificationService.send_due_date_reminder, borrowings_due_soon)
         
         logger.info(f"Sent {sent_count} due date reminders")
         return sent_count
@@ -326,13 +389,11 @@ class NotificationScheduler:
         """Send notifications for overdue books"""
         overdue_borrowings = Borrower.objects.filter(
             due_date__lt=date.today(),
-            status='borrowed'
+            status='borrowed',
+            borrower__email_notifications=True
         ).select_related('borrower__user', 'book')
         
-        sent_count = 0
-        for borrowing in overdue_borrowings:
-            if EmailNotificationService.send_overdue_notification(borrowing):
-                sent_count += 1
+        sent_count = NotificationScheduler.send_batch(EmailNotificationService.send_overdue_notification, overdue_borrowings)
         
         logger.info(f"Sent {sent_count} overdue notifications")
         return sent_count
@@ -344,13 +405,11 @@ class NotificationScheduler:
         
         expiring_reservations = BookReservation.objects.filter(
             expiry_date__date=warning_date,
-            status='active'
+            status='active',
+            user__email_notifications=True
         ).select_related('user__user', 'book')
         
-        sent_count = 0
-        for reservation in expiring_reservations:
-            if EmailNotificationService.send_reservation_expiry_warning(reservation):
-                sent_count += 1
+        sent_count = NotificationScheduler.send_batch(EmailNotificationService.send_reservation_expiry_warning, expiring_reservations)
         
         logger.info(f"Sent {sent_count} reservation expiry warnings")
         return sent_count
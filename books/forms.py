@@ -1,9 +1,33 @@
+import re
 from django import forms
 from django.core.exceptions import ValidationError
 from datetime import date, timedelta
 from .models import Book, Borrower, BookReservation
 from library_users.models import UserProfileinfo
 
+# Deletion tables for cleaning codes in a single str.translate pass
+ISBN_SEPARATORS = str.maketrans('', '', '- ')
+NON_ALNUM_LATIN1 = str.maketrans('', '', ''.join(chr(c) for c in range(256) if not chr(c).isalnum()))
+
+# ISBN-10 (check digit may be X) or ISBN-13, optionally split by single hyphens or spaces
+ISBN_PATTERN = re.compile(r'(?:\d[- ]?){9}[\dXx]|(?:\d[- ]?){12}\d', re.ASCII)
+
+# Language filter options for searches, built once at import
+LANGUAGE_FILTER_CHOICES = (('', 'All Languages'), *Book.LANGUAGE_CHOICES)
+
+# Cover image upload limits
+MAX_COVER_IMAGE_SIZE = 5 * 1024 * 1024
+COVER_IMAGE_TYPES = frozenset({'image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp'})
+
+
+def _alnum_only(value):
+    """Drop every character that is not a letter or digit"""
+    value = value.translate(NON_ALNUM_LATIN1)
+    if not value or value.isalnum():
+        return value
+    # Punctuation beyond Latin-1 is rare enough to filter one character at a time
+    return ''.join(filter(str.isalnum, value))
+
 
 class NewBook_form(forms.ModelForm):
     class Meta:
@@ -28,10 +52,10 @@ class NewBook_form(forms.ModelForm):
     def clean_isbn(self):
         isbn = self.cleaned_data.get('isbn')
         if isbn:
-            # Remove any hyphens or spaces
-            isbn = isbn.replace('-', '').replace(' ', '')
-            if len(isbn) not in [10, 13]:
+            if not ISBN_PATTERN.fullmatch(isbn):
                 raise ValidationError('ISBN must be 10 or 13 digits long.')
+            # Remove any hyphens or spaces
+            isbn = isbn.translate(ISBN_SEPARATORS).upper()
         return isbn
     
     def clean_publication_date(self):
@@ -44,7 +68,7 @@ class NewBook_form(forms.ModelForm):
         barcode = self.cleaned_data.get('barcode')
         if barcode:
             # Remove any spaces or special characters
-            barcode = ''.join(filter(str.isalnum, barcode))
+            barcode = _alnum_only(barcode)
             if len(barcode) < 8:
                 raise ValidationError('Barcode must be at least 8 characters long.')
             if len(barcode) > 50:
@@ -55,12 +79,11 @@ class NewBook_form(forms.ModelForm):
         cover_image = self.cleaned_data.get('cover_image')
         if cover_image:
             # Check file size (max 5MB)
-            if cover_image.size > 5 * 1024 * 1024:
+            if cover_image.size > MAX_COVER_IMAGE_SIZE:
                 raise ValidationError('Image file size must be less than 5MB.')
             
             # Check file type
-            allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
-            if cover_image.content_type not in allowed_types:
+            if cover_image.content_type not in COVER_IMAGE_TYPES:
                 raise ValidationError('Only JPEG, PNG, GIF, and WebP images are allowed.')
         
         return cover_image
@@ -77,10 +100,10 @@ class NewBorrower_form(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Only show available books
-        self.fields['book'].queryset = Book.objects.filter(is_available=True)
-        # Only show active users
-        self.fields['borrower'].queryset = UserProfileinfo.objects.filter(status='active')
+        # Only show available books, loading just what the options and clean() read
+        self.fields['book'].queryset = Book.objects.filter(is_available=True).only('id', 'title', 'is_available')
+        # Only show active users; their labels use the auth user's name
+        self.fields['borrower'].queryset = UserProfileinfo.objects.filter(status='active').select_related('user')
         # Set default due date to 2 weeks from today
         self.fields['due_date'].initial = date.today() + timedelta(days=14)
     
@@ -120,7 +143,7 @@ class BookSearchForm(forms.Form):
         })
     )
     language = forms.ChoiceField(
-        choices=[('', 'All Languages')] + Book.LANGUAGE_CHOICES,
+        choices=LANGUAGE_FILTER_CHOICES,
         required=False,
         widget=forms.Select(attrs={
             'class': 'form-control',
@@ -198,7 +221,7 @@ class BarcodeScanForm(forms.Form):
         barcode = self.cleaned_data.get('barcode')
         if barcode:
             # Remove any spaces or special characters
-            barcode = ''.join(filter(str.isalnum, barcode))
+            barcode = _alnum_only(barcode)
             if len(barcode) < 8:
                 raise ValidationError('Barcode must be at least 8 characters long.')
         return barcode
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from books.models import Book, Borrower
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Book.times_borrowed from the borrowing records'
+
+    def handle(self, *args, **options):
+        borrowings = Borrower.objects.filter(book=OuterRef('pk')).order_by().values('book').annotate(
+            count=Count('id')
+        ).values('count')
+        updated = Book.objects.update(times_borrowed=Coalesce(Subquery(borrowings), 0))
+        self.stdout.write(
+            self.style.SUCCESS(f'Recounted borrowings for {updated} books')
+        )
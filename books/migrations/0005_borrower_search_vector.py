@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.db import migrations
+
+# Keeps books_borrower.search_vector in sync with the book title and the
+# borrower's username/email, so the admin search is one GIN probe instead
+# of ILIKE over three joined tables.
+CREATE_SQL = """
+ALTER TABLE books_borrower ADD COLUMN IF NOT EXISTS search_vector tsvector;
+CREATE INDEX IF NOT EXISTS borrower_search_idx ON books_borrower USING gin (search_vector);
+
+CREATE OR REPLACE FUNCTION books_borrower_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := (
+        SELECT to_tsvector(
+            'simple',
+            coalesce(b.title, '') || ' ' || coalesce(u.username, '') || ' ' || coalesce(u.email, '')
+        )
+        FROM books_book b, library_users_userprofileinfo p
+        JOIN auth_user u ON u.id = p.user_id
+        WHERE b.id = NEW.book_id AND p.id = NEW.borrower_id
+    );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER books_borrower_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF book_id, borrower_id ON books_borrower
+    FOR EACH ROW EXECUTE FUNCTION books_borrower_search_vector();
+
+CREATE OR REPLACE FUNCTION books_book_refresh_borrower_search() RETURNS trigger AS $$
+BEGIN
+    UPDATE books_borrower SET book_id = book_id WHERE book_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER books_book_refresh_borrower_search_trigger
+    AFTER UPDATE OF title ON books_book
+    FOR EACH ROW EXECUTE FUNCTION books_book_refresh_borrower_search();
+
+CREATE OR REPLACE FUNCTION auth_user_refresh_borrower_search() RETURNS trigger AS $$
+BEGIN
+    UPDATE books_borrower SET borrower_id = borrower_id
+    WHERE borrower_id IN (SELECT id FROM library_users_userprofileinfo WHERE user_id = NEW.id);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER auth_user_refresh_borrower_search_trigger
+    AFTER UPDATE OF username, email ON auth_user
+    FOR EACH ROW EXECUTE FUNCTION auth_user_refresh_borrower_search();
+
+UPDATE books_borrower SET book_id = book_id;
+"""
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS auth_user_refresh_borrower_search_trigger ON auth_user;
+DROP FUNCTION IF EXISTS auth_user_refresh_borrower_search();
+DROP TRIGGER IF EXISTS books_book_refresh_borrower_search_trigger ON books_book;
+DROP FUNCTION IF EXISTS books_book_refresh_borrower_search();
+DROP TRIGGER IF EXISTS books_borrower_search_vector_trigger ON books_borrower;
+DROP FUNCTION IF EXISTS books_borrower_search_vector();
+DROP INDEX IF EXISTS borrower_search_idx;
+ALTER TABLE books_borrower DROP COLUMN IF EXISTS search_vector;
+"""
+
+
+def create_search_vector(apps, schema_editor):
+    # tsvector and triggers only exist on PostgreSQL; other backends keep the icontains search
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(CREATE_SQL)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0004_book_trigram_index"),
+        ("library_users", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
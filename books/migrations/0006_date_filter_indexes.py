@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0005_borrower_search_vector"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="book",
+            name="date_added",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="borrower",
+            name="borrow_date",
+            field=models.DateField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="borrowrequest",
+            name="request_date",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
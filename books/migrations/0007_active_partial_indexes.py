@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0006_date_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrower",
+            index=models.Index(
+                condition=models.Q(("status", "borrowed")),
+                fields=["due_date"],
+                name="borrower_active_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bookreservation",
+            index=models.Index(
+                condition=models.Q(("status", "active")),
+                fields=["expiry_date"],
+                name="reservation_active_idx",
+            ),
+        ),
+    ]
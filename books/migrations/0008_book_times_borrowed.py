@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_borrowings(apps, schema_editor):
+    Book = apps.get_model("books", "Book")
+    Borrower = apps.get_model("books", "Borrower")
+    borrowings = Borrower.objects.filter(book=OuterRef("pk")).order_by().values("book").annotate(
+        count=Count("id")
+    ).values("count")
+    Book.objects.update(times_borrowed=Coalesce(Subquery(borrowings), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0007_active_partial_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="times_borrowed",
+            field=models.PositiveIntegerField(
+                db_index=True,
+                default=0,
+                editable=False,
+                help_text="Kept up to date from the borrowings; used to rank popular books",
+            ),
+        ),
+        migrations.RunPython(count_borrowings, migrations.RunPython.noop),
+    ]
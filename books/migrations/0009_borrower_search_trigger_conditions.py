@@ -0,0 +1,97 @@
+from django.db import migrations
+
+# The refresh triggers from 0005 fired on every UPDATE naming title/username/email
+# (Django's save() names them all) and rewrote the borrowings through dummy
+# updates. Only fire when the value really changes, and write search_vector directly.
+FORWARD_SQL = """
+CREATE OR REPLACE FUNCTION books_book_refresh_borrower_search() RETURNS trigger AS $$
+BEGIN
+    UPDATE books_borrower br
+    SET search_vector = to_tsvector(
+        'simple',
+        coalesce(NEW.title, '') || ' ' || coalesce(u.username, '') || ' ' || coalesce(u.email, '')
+    )
+    FROM library_users_userprofileinfo p
+    JOIN auth_user u ON u.id = p.user_id
+    WHERE br.book_id = NEW.id AND p.id = br.borrower_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_book_refresh_borrower_search_trigger ON books_book;
+CREATE TRIGGER books_book_refresh_borrower_search_trigger
+    AFTER UPDATE OF title ON books_book
+    FOR EACH ROW
+    WHEN (OLD.title IS DISTINCT FROM NEW.title)
+    EXECUTE FUNCTION books_book_refresh_borrower_search();
+
+CREATE OR REPLACE FUNCTION auth_user_refresh_borrower_search() RETURNS trigger AS $$
+BEGIN
+    UPDATE books_borrower br
+    SET search_vector = to_tsvector(
+        'simple',
+        coalesce(b.title, '') || ' ' || coalesce(NEW.username, '') || ' ' || coalesce(NEW.email, '')
+    )
+    FROM library_users_userprofileinfo p, books_book b
+    WHERE p.user_id = NEW.id AND br.borrower_id = p.id AND b.id = br.book_id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS auth_user_refresh_borrower_search_trigger ON auth_user;
+CREATE TRIGGER auth_user_refresh_borrower_search_trigger
+    AFTER UPDATE OF username, email ON auth_user
+    FOR EACH ROW
+    WHEN (OLD.username IS DISTINCT FROM NEW.username OR OLD.email IS DISTINCT FROM NEW.email)
+    EXECUTE FUNCTION auth_user_refresh_borrower_search();
+"""
+
+REVERSE_SQL = """
+CREATE OR REPLACE FUNCTION books_book_refresh_borrower_search() RETURNS trigger AS $$
+BEGIN
+    UPDATE books_borrower SET book_id = book_id WHERE book_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_book_refresh_borrower_search_trigger ON books_book;
+CREATE TRIGGER books_book_refresh_borrower_search_trigger
+    AFTER UPDATE OF title ON books_book
+    FOR EACH ROW EXECUTE FUNCTION books_book_refresh_borrower_search();
+
+CREATE OR REPLACE FUNCTION auth_user_refresh_borrower_search() RETURNS trigger AS $$
+BEGIN
+    UPDATE books_borrower SET borrower_id = borrower_id
+    WHERE borrower_id IN (SELECT id FROM library_users_userprofileinfo WHERE user_id = NEW.id);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS auth_user_refresh_borrower_search_trigger ON auth_user;
+CREATE TRIGGER auth_user_refresh_borrower_search_trigger
+    AFTER UPDATE OF username, email ON auth_user
+    FOR EACH ROW EXECUTE FUNCTION auth_user_refresh_borrower_search();
+"""
+
+
+def condition_refresh_triggers(apps, schema_editor):
+    # The triggers only exist on PostgreSQL, see 0005
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(FORWARD_SQL)
+
+
+def restore_refresh_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(REVERSE_SQL)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("books", "0008_book_times_borrowed"),
+    ]
+
+    operations = [
+        migrations.RunPython(condition_refresh_triggers, restore_refresh_triggers),
+    ]
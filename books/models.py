@@ -1,7 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from library_users.models import UserProfileinfo
-from datetime import date
+from datetime import date, timedelta
 
 # Create your models here.
 
@@ -74,7 +75,8 @@ class Book(models.Model):
     
     # Status
     is_available = models.BooleanField(default=True)
-    date_added = models.DateTimeField(auto_now_add=True)
+    times_borrowed = models.PositiveIntegerField(default=0, db_index=True, editable=False, help_text="Kept up to date from the borrowings; used to rank popular books")
+    date_added = models.DateTimeField(auto_now_add=True, db_index=True)
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -107,7 +109,7 @@ class Borrower(models.Model):
     
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='borrowings')
     borrower = models.ForeignKey(UserProfileinfo, on_delete=models.CASCADE, related_name='borrowed_books')
-    borrow_date = models.DateField(auto_now_add=True)
+    borrow_date = models.DateField(auto_now_add=True, db_index=True)
     due_date = models.DateField()
     return_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='borrowed')
@@ -134,6 +136,10 @@ class Borrower(models.Model):
         ordering = ['-borrow_date']
         verbose_name = 'Book Borrowing'
         verbose_name_plural = 'Book Borrowings'
+        indexes = [
+            # Overdue and due-soon lookups only ever look at books still out
+            models.Index(fields=['due_date'], condition=models.Q(status='borrowed'), name='borrower_active_due_idx'),
+        ]
 
 
 class BorrowRequest(models.Model):
@@ -146,7 +152,7 @@ class BorrowRequest(models.Model):
     
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='borrow_requests')
     requester = models.ForeignKey(UserProfileinfo, on_delete=models.CASCADE, related_name='borrow_requests')
-    request_date = models.DateTimeField(auto_now_add=True)
+    request_date = models.DateTimeField(auto_now_add=True, db_index=True)
     requested_duration_days = models.PositiveIntegerField(default=14, help_text="Number of days to borrow")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(null=True, blank=True, help_text="Additional notes from requester")
@@ -161,6 +167,35 @@ class BorrowRequest(models.Model):
     def is_pending(self):
         return self.status == 'pending'
     
+    def approve(self, processed_by=None, admin_notes=''):
+        """Lend the book to the requester and mark the request approved.
+        
+        Call inside transaction.atomic() after locking this request and its book
+        with select_for_update(), and only once the book is known to be available.
+        """
+        borrowing = Borrower.objects.create(
+            book=self.book,
+            borrower=self.requester,
+            due_date=date.today() + timedelta(days=self.requested_duration_days),
+            status='borrowed'
+        )
+        
+        # Only save availability so the times_borrowed bump from the post_save signal isn't overwritten
+        self.book.is_available = False
+        self.book.save(update_fields=['is_available', 'last_updated'])
+        
+        # Count in SQL; one admin action can approve several requests by the same member
+        UserProfileinfo.objects.filter(pk=self.requester_id).update(
+            current_books_count=models.F('current_books_count') + 1
+        )
+        
+        self.status = 'approved'
+        self.admin_notes = admin_notes
+        self.processed_by = processed_by
+        self.processed_date = timezone.now()
+        self.save()
+        return borrowing
+    
     class Meta:
         ordering = ['-request_date']
         verbose_name = 'Borrow Request'
@@ -219,4 +254,8 @@ class BookReservation(models.Model):
         ordering = ['-reservation_date']
         unique_together = ['book', 'user', 'status']
         verbose_name = 'Book Reservation'
-        verbose_name_plural = 'Book Reservations'
\ No newline at end of file
+        verbose_name_plural = 'Book Reservations'
+        indexes = [
+            # Expiry checks only ever look at active reservations
+            models.Index(fields=['expiry_date'], condition=models.Q(status='active'), name='reservation_active_idx'),
+        ]
\ No newline at end of file
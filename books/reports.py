@@ -1,21 +1,30 @@
+from django.core.cache import cache
 from django.db.models import Count, Q, Avg, Sum, F
 from django.utils import timezone
 from datetime import date, timedelta
 from .models import Book, Borrower, BookReservation, BorrowRequest, ReturnRequest
 from library_users.models import UserProfileinfo
 
+# How long the most borrowed books ranking is reused before it is recomputed
+POPULAR_BOOKS_CACHE_TIMEOUT = 60 * 15
+
 
 class LibraryReports:
     """Library analytics and reporting utilities"""
     
     @staticmethod
     def get_popular_books(limit=10):
-        """Get most borrowed books"""
-        return Book.objects.annotate(
-            borrow_count=Count('borrowings')
-        ).filter(
-            borrow_count__gt=0
-        ).order_by('-borrow_count')[:limit]
+        """Get most borrowed books, re-ranking at most every POPULAR_BOOKS_CACHE_TIMEOUT seconds"""
+        # Only the ranked ids are cached; the rows are read fresh so availability is never stale
+        book_ids = cache.get_or_set(
+            f'popular_book_ids:{limit}',
+            lambda: list(Book.objects.filter(
+                times_borrowed__gt=0
+            ).order_by('-times_borrowed').values_list('id', flat=True)[:limit]),
+            POPULAR_BOOKS_CACHE_TIMEOUT
+        )
+        books = Book.objects.annotate(borrow_count=F('times_borrowed')).in_bulk(book_ids)
+        return [books[book_id] for book_id in book_ids if book_id in books]
     
     @staticmethod
     def get_overdue_books():
@@ -39,29 +48,26 @@ class LibraryReports:
     @staticmethod
     def get_user_statistics():
         """Get user statistics"""
-        total_users = UserProfileinfo.objects.count()
-        active_users = UserProfileinfo.objects.filter(status='active').count()
-        users_with_books = UserProfileinfo.objects.filter(
-            current_books_count__gt=0
-        ).count()
-        users_with_fines = UserProfileinfo.objects.filter(
-            total_fines__gt=0
-        ).count()
+        counts = UserProfileinfo.objects.aggregate(
+            total_users=Count('id'),
+            active_users=Count('id', filter=Q(status='active')),
+            users_with_books=Count('id', filter=Q(current_books_count__gt=0)),
+            users_with_fines=Count('id', filter=Q(total_fines__gt=0)),
+        )
         
         return {
-            'total_users': total_users,
-            'active_users': active_users,
-            'users_with_books': users_with_books,
-            'users_with_fines': users_with_fines,
-            'inactive_users': total_users - active_users,
+            **counts,
+            'inactive_users': counts['total_users'] - counts['active_users'],
         }
     
     @staticmethod
     def get_book_statistics():
         """Get book statistics"""
-        total_books = Book.objects.count()
-        available_books = Book.objects.filter(is_available=True).count()
-        borrowed_books = Book.objects.filter(is_available=False).count()
+        counts = Book.objects.aggregate(
+            total_books=Count('id'),
+            available_books=Count('id', filter=Q(is_available=True)),
+            borrowed_books=Count('id', filter=Q(is_available=False)),
+        )
         
         # Books by language
         books_by_language = Book.objects.values('language').annotate(
@@ -74,9 +80,7 @@ class LibraryReports:
         ).order_by('-count')
         
         return {
-            'total_books': total_books,
-            'available_books': available_books,
-            'borrowed_books': borrowed_books,
+            **counts,
             'books_by_language': list(books_by_language),
             'books_by_condition': list(books_by_condition),
         }
@@ -84,13 +88,13 @@ class LibraryReports:
     @staticmethod
     def get_borrowing_statistics():
         """Get borrowing statistics"""
-        total_borrowings = Borrower.objects.count()
-        active_borrowings = Borrower.objects.filter(status='borrowed').count()
-        overdue_borrowings = Borrower.objects.filter(
-            due_date__lt=date.today(),
-            status='borrowed'
-        ).count()
-        returned_borrowings = Borrower.objects.filter(status='returned').count()
+        counts = Borrower.objects.aggregate(
+            total_borrowings=Count('id'),
+            active_borrowings=Count('id', filter=Q(status='borrowed')),
+            overdue_borrowings=Count('id', filter=Q(status='borrowed', due_date__lt=date.today())),
+            returned_borrowings=Count('id', filter=Q(status='returned')),
+            total_fines=Sum('fine_amount'),
+        )
         
         # Average borrowing period
         returned_books = Borrower.objects.filter(
@@ -106,27 +110,25 @@ class LibraryReports:
             ])
             avg_borrowing_days = total_days / returned_books.count()
         
-        # Total fines collected
-        total_fines = Borrower.objects.aggregate(
-            total=Sum('fine_amount')
-        )['total'] or 0
-        
         return {
-            'total_borrowings': total_borrowings,
-            'active_borrowings': active_borrowings,
-            'overdue_borrowings': overdue_borrowings,
-            'returned_borrowings': returned_borrowings,
+            'total_borrowings': counts['total_borrowings'],
+            'active_borrowings': counts['active_borrowings'],
+            'overdue_borrowings': counts['overdue_borrowings'],
+            'returned_borrowings': counts['returned_borrowings'],
             'avg_borrowing_days': round(avg_borrowing_days, 1),
-            'total_fines': total_fines,
+            # Total fines collected
+            'total_fines': counts['total_fines'] or 0,
         }
     
     @staticmethod
     def get_reservation_statistics():
         """Get reservation statistics"""
-        total_reservations = BookReservation.objects.count()
-        active_reservations = BookReservation.objects.filter(status='active').count()
-        fulfilled_reservations = BookReservation.objects.filter(status='fulfilled').count()
-        expired_reservations = BookReservation.objects.filter(status='expired').count()
+        counts = BookReservation.objects.aggregate(
+            total_reservations=Count('id'),
+            active_reservations=Count('id', filter=Q(status='active')),
+            fulfilled_reservations=Count('id', filter=Q(status='fulfilled')),
+            expired_reservations=Count('id', filter=Q(status='expired')),
+        )
         
         # Most reserved books
         most_reserved = Book.objects.annotate(
@@ -136,10 +138,7 @@ class LibraryReports:
         ).order_by('-reservation_count')[:5]
         
         return {
-            'total_reservations': total_reservations,
-            'active_reservations': active_reservations,
-            'fulfilled_reservations': fulfilled_reservations,
-            'expired_reservations': expired_reservations,
+            **counts,
             'most_reserved_books': most_reserved,
         }
     
@@ -286,10 +285,12 @@ class LibraryReports:
         }
         
         # Collection utilization
-        total_books = Book.objects.count()
-        books_never_borrowed = Book.objects.annotate(
-            borrow_count=Count('borrowings')
-        ).filter(borrow_count=0).count()
+        book_counts = Book.objects.aggregate(
+            total=Count('id'),
+            never_borrowed=Count('id', filter=Q(times_borrowed=0)),
+        )
+        total_books = book_counts['total']
+        books_never_borrowed = book_counts['never_borrowed']
         
         utilization_rate = 0
         if total_books > 0:
@@ -316,7 +317,7 @@ class LibraryReports:
         
         # Books with highest demand (reservations + borrows)
         high_demand_books = Book.objects.annotate(
-            total_demand=Count('borrowings') + Count('reservations')
+            total_demand=F('times_borrowed') + Count('reservations')
         ).filter(total_demand__gt=0).order_by('-total_demand')[:5]
         
         # Most efficient users (lowest overdue rate)
@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Book, Borrower
+from library_users.models import UserProfileinfo
+
+# Part of every cached dashboard key; bumping it retires all of them at once
+DASHBOARD_VERSION_KEY = 'dashboard_version'
+
+
+def get_dashboard_version():
+    # A timestamp start keeps a re-created version from reusing an evicted one's entries
+    return cache.get_or_set(DASHBOARD_VERSION_KEY, time.time_ns, None)
+
+
+@receiver(post_save, sender=Borrower)
+def count_new_borrowing(sender, instance, created, **kwargs):
+    """Keep Book.times_borrowed in step when a borrowing is recorded"""
+    if created:
+        Book.objects.filter(pk=instance.book_id).update(times_borrowed=F('times_borrowed') + 1)
+
+
+@receiver(post_delete, sender=Borrower)
+def uncount_deleted_borrowing(sender, instance, **kwargs):
+    """Keep Book.times_borrowed in step when a borrowing is removed"""
+    Book.objects.filter(pk=instance.book_id, times_borrowed__gt=0).update(times_borrowed=F('times_borrowed') - 1)
+
+
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=Borrower)
+@receiver([post_save, post_delete], sender=UserProfileinfo)
+def bump_dashboard_version(sender=None, **kwargs):
+    """Retire the cached dashboard counts when a book, borrowing or member changes"""
+    try:
+        cache.incr(DASHBOARD_VERSION_KEY)
+    except ValueError:
+        cache.add(DASHBOARD_VERSION_KEY, time.time_ns(), None)
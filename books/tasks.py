@@ -88,7 +88,7 @@ def send_reservation_expiry_warnings():
 def send_welcome_email(user_profile_id):
     """Celery task to send welcome email to new users"""
     try:
-        user_profile = UserProfileinfo.objects.get(id=user_profile_id)
+        user_profile = UserProfileinfo.objects.select_related('user').get(id=user_profile_id)
         success = EmailNotificationService.send_welcome_email(user_profile)
         
         if success:
@@ -110,7 +110,7 @@ def send_welcome_email(user_profile_id):
 def send_reservation_available_notification(reservation_id):
     """Celery task to send reservation available notification"""
     try:
-        reservation = BookReservation.objects.get(id=reservation_id)
+        reservation = BookReservation.objects.select_related('user__user', 'book').get(id=reservation_id)
         success = EmailNotificationService.send_reservation_available(reservation)
         
         if success:
@@ -132,7 +132,7 @@ def send_reservation_available_notification(reservation_id):
 def send_return_confirmation(borrowing_id):
     """Celery task to send book return confirmation"""
     try:
-        borrowing = Borrower.objects.get(id=borrowing_id)
+        borrowing = Borrower.objects.select_related('borrower__user', 'book').get(id=borrowing_id)
         success = EmailNotificationService.send_book_return_confirmation(borrowing)
         
         if success:
@@ -1,3 +1,287 @@
-from django.test import TestCase
+import unittest
+from datetime import date, datetime
 
-# Create your tests here.
+import tablib
+
+from django.contrib import admin
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .book_import import clean_book_dataset
+from .decorators import is_librarian
+from .forms import NewBook_form
+from .models import Book, Borrower, BorrowRequest
+from .signals import get_dashboard_version
+from library_users.models import UserProfileinfo
+
+
+def make_book(serial='B-0001', **kwargs):
+    kwargs.setdefault('title', f'Book {serial}')
+    return Book.objects.create(serial=serial, shelf='A1', author='Author', **kwargs)
+
+
+def make_member(username='member'):
+    user = User.objects.create_user(username=username, email=f'{username}@example.com', password='pass')
+    return UserProfileinfo.objects.create(user=user)
+
+
+class BookImportCleaningTests(SimpleTestCase):
+    """clean_book_dataset maps the Excel template columns onto Book fields in place"""
+
+    def clean(self, headers, *rows):
+        dataset = tablib.Dataset(*rows, headers=headers)
+        clean_book_dataset(dataset)
+        return dataset.dict
+
+    def test_text_is_stripped_and_required_fields_get_defaults(self):
+        row, empty = self.clean(
+            ['serial', 'shelf', 'Title', 'Author', 'Publisher'],
+            ('S-1', 'A1', '  Dune ', 'Frank Herbert', 'NaN'),
+            ('S-2', 'A1', '', None, '   '),
+        )
+        self.assertEqual(row['title'], 'Dune')
+        self.assertIsNone(row['publisher'])
+        self.assertEqual(empty['title'], 'Unknown Title')
+        self.assertEqual(empty['author'], 'Unknown Author')
+        self.assertIsNone(empty['publisher'])
+
+    def test_numbers_from_cells_and_text_are_truncated(self):
+        rows = self.clean(
+            ['serial', 'Pages', 'Copy'],
+            ('S-1', 320.7, 0),
+            ('S-2', ' 150 ', None),
+            ('S-3', 'many', 2),
+        )
+        self.assertEqual([row['pages'] for row in rows], [320, 150, None])
+        self.assertEqual([row['copy_number'] for row in rows], [1, 1, 2])
+
+    def test_dates_accept_each_format_and_keep_bad_text_for_the_widget(self):
+        rows = self.clean(
+            ['serial', 'Publication_Datte'],
+            ('S-1', '2020-05-17'),
+            ('S-2', '17/05/2020'),
+            ('S-3', 2019),
+            ('S-4', 'someday'),
+            ('S-5', None),
+        )
+        self.assertEqual([row['publication_date'] for row in rows], [
+            date(2020, 5, 17), date(2020, 5, 17), date(2019, 1, 1), 'someday', None
+        ])
+
+    def test_ambiguous_slashed_dates_are_month_first(self):
+        rows = self.clean(['serial', 'Publication_Datte'], ('S-1', '03/04/2020'))
+        self.assertEqual(rows[0]['publication_date'], date(2020, 3, 4))
+
+    def test_excel_date_cells_keep_their_date(self):
+        rows = self.clean(
+            ['serial', 'Publication_Datte'],
+            ('S-1', datetime(2020, 1, 2)),
+            ('S-2', date(1999, 12, 31)),
+            ('S-3', '2021-06-30'),
+        )
+        self.assertEqual([row['publication_date'] for row in rows], [
+            date(2020, 1, 2), date(1999, 12, 31), date(2021, 6, 30)
+        ])
+
+    def test_choices_are_mapped_from_free_text(self):
+        rows = self.clean(
+            ['serial', 'Language', 'Cover_Type', 'Condition'],
+            ('S-1', 'English ', 'Hard Cover', 'Very Good'),
+            ('S-2', 'fr', 'soft', 'DAMAGED'),
+            ('S-3', 'Klingon', 'scroll', 'mint'),
+            ('S-4', None, None, None),
+        )
+        self.assertEqual([row['language'] for row in rows], ['en', 'fr', 'other', 'en'])
+        self.assertEqual([row['cover_type'] for row in rows], ['hardcover', 'paperback', 'paperback', 'paperback'])
+        self.assertEqual([row['condition'] for row in rows], ['good', 'damaged', 'good', 'good'])
+
+    def test_cells_naming_several_choices_follow_the_keyword_priority(self):
+        rows = self.clean(
+            ['serial', 'Language', 'Cover_Type', 'Condition'],
+            ('S-1', 'Arabic and English', 'Softcover, digital copy', 'Fair to good'),
+            ('S-2', 'German / French', 'Paper over hard boards', 'Poor, damaged spine'),
+        )
+        self.assertEqual([row['language'] for row in rows], ['en', 'fr'])
+        self.assertEqual([row['cover_type'] for row in rows], ['paperback', 'hardcover'])
+        self.assertEqual([row['condition'] for row in rows], ['good', 'poor'])
+
+    def test_missing_serials_get_unique_generated_ones(self):
+        rows = self.clean(['serial', 'Title'], (None, 'One'), ('', 'Two'), ('S-3', 'Three'))
+        generated = [row['serial'] for row in rows[:2]]
+        self.assertTrue(all(serial.startswith('AUTO_') and len(serial) <= 20 for serial in generated))
+        self.assertNotEqual(generated[0], generated[1])
+        self.assertEqual(rows[2]['serial'], 'S-3')
+
+
+class IsbnValidationTests(TestCase):
+
+    def clean_isbn(self, isbn):
+        form = NewBook_form(data={'isbn': isbn})
+        form.is_valid()
+        return form.cleaned_data.get('isbn'), form.errors.get('isbn')
+
+    def test_valid_isbns_are_stored_without_separators(self):
+        self.assertEqual(self.clean_isbn('978-0-306-40615-7'), ('9780306406157', None))
+        self.assertEqual(self.clean_isbn('0 306 40615 2'), ('0306406152', None))
+        self.assertEqual(self.clean_isbn('030640615x'), ('030640615X', None))
+
+    def test_malformed_isbns_are_rejected(self):
+        for isbn in ('ABCDEFGHIJ', '12345', '97803064061571', '978--0306406157', '0306406152-'):
+            with self.subTest(isbn=isbn):
+                self.assertIsNotNone(self.clean_isbn(isbn)[1])
+
+
+class BorrowCountTests(TestCase):
+    """Book.times_borrowed has to survive the views that also save the book"""
+
+    def setUp(self):
+        self.librarian = User.objects.create_superuser('librarian', 'librarian@example.com', 'pass')
+        self.client.force_login(self.librarian)
+        self.book = make_book()
+        self.member = make_member()
+
+    def test_approving_a_request_counts_the_borrowing(self):
+        borrow_request = BorrowRequest.objects.create(book=self.book, requester=self.member)
+
+        response = self.client.post(reverse('books:approve_borrow_request', args=[borrow_request.id]))
+
+        self.assertEqual(response.status_code, 302)
+        self.book.refresh_from_db()
+        self.assertFalse(self.book.is_available)
+        self.assertEqual(self.book.times_borrowed, 1)
+
+    def test_recording_and_deleting_borrowings_adjusts_the_count(self):
+        first = Borrower.objects.create(book=self.book, borrower=self.member, due_date=date.today())
+        Borrower.objects.create(book=self.book, borrower=self.member, due_date=date.today())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.times_borrowed, 2)
+
+        first.status = 'returned'
+        first.save()
+        first.delete()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.times_borrowed, 1)
+
+
+class BulkApproveTests(TestCase):
+    """The admin approve action lends each available book once, oldest request first"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        self.member = make_member()
+        self.other_member = make_member('other')
+        self.first_book = make_book('B-0001')
+        self.second_book = make_book('B-0002')
+
+    def approve(self, *borrow_requests):
+        return self.client.post(reverse('admin:books_borrowrequest_changelist'), {
+            'action': 'approve_selected',
+            '_selected_action': [borrow_request.pk for borrow_request in borrow_requests],
+        })
+
+    def test_each_book_is_lent_to_its_oldest_request(self):
+        first = BorrowRequest.objects.create(book=self.first_book, requester=self.member)
+        later = BorrowRequest.objects.create(book=self.first_book, requester=self.other_member)
+        second = BorrowRequest.objects.create(book=self.second_book, requester=self.member)
+
+        self.approve(first, later, second)
+
+        statuses = dict(BorrowRequest.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {first.pk: 'approved', later.pk: 'pending', second.pk: 'approved'})
+        self.assertEqual(Borrower.objects.filter(status='borrowed').count(), 2)
+        self.member.refresh_from_db()
+        self.other_member.refresh_from_db()
+        self.assertEqual(self.member.current_books_count, 2)
+        self.assertEqual(self.other_member.current_books_count, 0)
+        for book in (self.first_book, self.second_book):
+            book.refresh_from_db()
+            self.assertFalse(book.is_available)
+            self.assertEqual(book.times_borrowed, 1)
+
+    def test_unavailable_books_are_skipped(self):
+        self.first_book.is_available = False
+        self.first_book.save()
+        borrow_request = BorrowRequest.objects.create(book=self.first_book, requester=self.member)
+
+        self.approve(borrow_request)
+
+        borrow_request.refresh_from_db()
+        self.assertEqual(borrow_request.status, 'pending')
+        self.assertFalse(Borrower.objects.exists())
+
+
+class DashboardCacheTests(TestCase):
+    """Cached dashboard counts are retired as soon as the underlying rows change"""
+
+    def test_changing_a_borrowing_bumps_the_dashboard_version(self):
+        borrowing = Borrower.objects.create(book=make_book(), borrower=make_member(), due_date=date.today())
+        version = get_dashboard_version()
+
+        borrowing.status = 'returned'
+        borrowing.save()
+        self.assertNotEqual(get_dashboard_version(), version)
+
+        version = get_dashboard_version()
+        borrowing.delete()
+        self.assertNotEqual(get_dashboard_version(), version)
+
+
+class RoleCheckTests(TestCase):
+    """Group lookups are remembered for one request only"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('staff', 'staff@example.com', 'pass')
+        self.librarians = Group.objects.create(name='Librarian')
+        self.user.groups.add(self.librarians)
+
+    def test_group_names_are_loaded_once_per_user_object(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(is_librarian(user))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_librarian(user))
+
+    def test_removed_librarian_loses_access_on_the_next_request(self):
+        self.assertTrue(is_librarian(User.objects.get(pk=self.user.pk)))
+        self.user.groups.remove(self.librarians)
+        self.assertFalse(is_librarian(User.objects.get(pk=self.user.pk)))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'search_vector only exists on PostgreSQL')
+class BorrowerSearchVectorTests(TestCase):
+    """The search_vector column from migration 0005 is kept up to date by triggers"""
+
+    def setUp(self):
+        self.book = make_book(title='Harry Potter')
+        self.member = make_member('hermione')
+        self.borrowing = Borrower.objects.create(book=self.book, borrower=self.member, due_date=date.today())
+        self.model_admin = admin.site._registry[Borrower]
+
+    def search(self, term):
+        queryset, _ = self.model_admin.get_search_results(None, Borrower.objects.all(), term)
+        return list(queryset)
+
+    def vector_matches(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT search_vector @@ to_tsquery('simple', %s) FROM books_borrower WHERE id = %s",
+                [query, self.borrowing.id]
+            )
+            return cursor.fetchone()[0]
+
+    def test_insert_fills_the_search_vector(self):
+        self.assertTrue(self.vector_matches('harry & potter & hermione'))
+
+    def test_renaming_the_book_refreshes_the_vector(self):
+        Book.objects.filter(pk=self.book.pk).update(title='Dune')
+        self.assertTrue(self.vector_matches('dune'))
+        self.assertFalse(self.vector_matches('potter'))
+
+    def test_changing_the_email_refreshes_the_vector(self):
+        User.objects.filter(pk=self.member.user_id).update(email='granger@hogwarts.example')
+        self.assertTrue(self.vector_matches('granger:*'))
+
+    def test_admin_search_matches_word_prefixes(self):
+        self.assertEqual(self.search('harr'), [self.borrowing])
+        self.assertEqual(self.search('herm pott'), [self.borrowing])
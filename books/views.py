@@ -5,6 +5,7 @@ from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.urls import reverse_lazy
 from django.http import JsonResponse, HttpResponseForbidden
+from django.db import transaction
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from datetime import date, timedelta
@@ -22,8 +23,12 @@ from .reports import LibraryReports
 
 def landing(request):
     """Landing page with library statistics and honor board"""
-    total_books = Book.objects.count()
-    available_books = Book.objects.filter(is_available=True).count()
+    book_counts = Book.objects.aggregate(
+        total=Count('id'),
+        available=Count('id', filter=Q(is_available=True)),
+    )
+    total_books = book_counts['total']
+    available_books = book_counts['available']
     borrowed_books = Borrower.objects.filter(status='borrowed').count()
     total_users = UserProfileinfo.objects.filter(status='active').count()
     
@@ -49,7 +54,8 @@ class BooksListView(ListView):
     ordering = ['title']
     
     def get_queryset(self):
-        queryset = Book.objects.all()
+        # Only load the columns book_list.html renders; summaries and contents can be large
+        queryset = Book.objects.only('id', 'title', 'author', 'isbn', 'language', 'is_available', 'cover_image')
         
         # Filter by availability
         availability = self.request.GET.get('availability')
@@ -66,7 +72,7 @@ class BooksListView(ListView):
         # Advanced search functionality with ranking and multiple search modes
         search_query = self.request.GET.get('q')
         if search_query:
-            from django.db.models import Case, When, IntegerField, Value, Count
+            from django.db.models import Case, When, IntegerField, Value
             
             # Clean and prepare search query
             search_query = search_query.strip()
@@ -185,15 +191,10 @@ class BooksListView(ListView):
                 queryset = queryset.order_by('-date_added')
             elif sort_by == 'popularity':
                 # Sort by number of borrowings (most borrowed first)
-                queryset = queryset.annotate(
-                    borrow_count=Count('borrowings')
-                ).order_by('-borrow_count', 'title')
+                queryset = queryset.order_by('-times_borrowed', 'title')
             else:
                 # Default to relevance sorting
                 queryset = queryset.order_by('-relevance_score', 'title')
-            
-            # Remove duplicates while preserving order
-            queryset = queryset.distinct()
         
         return queryset
     
@@ -353,7 +354,9 @@ class SearchResultsView(ListView):
             )
             
             # Apply search filter and add relevance scoring
-            queryset = Book.objects.filter(combined_filter).annotate(
+            queryset = Book.objects.filter(combined_filter).only(
+                'id', 'title', 'author', 'main_class'
+            ).annotate(
                 relevance_score=Case(
                     # Exact matches get highest score
                     When(Q(title__iexact=query) | Q(author__iexact=query), then=Value(100)),
@@ -381,58 +384,71 @@ class SearchResultsView(ListView):
 @login_required
 def borrow_book(request, book_id):
     """Submit a borrow request for a book"""
-    book = get_object_or_404(Book, id=book_id)
     user_profile = get_object_or_404(UserProfileinfo, user=request.user)
     
-    if not book.is_available:
-        messages.error(request, 'This book is not available for borrowing.')
-        return redirect('books:book_detail', pk=book.pk)
-    
-    # Check if user already has a pending request for this book
-    existing_request = BorrowRequest.objects.filter(
-        book=book,
-        requester=user_profile,
-        status='pending'
-    ).first()
-    
-    if existing_request:
-        messages.warning(request, f'You already have a pending request for "{book.title}".')
-        return redirect('books:book_detail', pk=book.pk)
-    
-    if request.method == 'POST':
-        duration_days = int(request.POST.get('duration_days', 14))
-        notes = request.POST.get('notes', '')
+    with transaction.atomic():
+        # Lock the book while submitting so a double submit can't pass the checks below twice
+        books = Book.objects.select_for_update() if request.method == 'POST' else Book.objects.all()
+        book = get_object_or_404(books, id=book_id)
+        
+        if not book.is_available:
+            messages.error(request, 'This book is not available for borrowing.')
+            return redirect('books:book_detail', pk=book.pk)
         
-        # Create borrow request
-        borrow_request = BorrowRequest.objects.create(
+        # Check if user already has a pending request for this book
+        existing_request = BorrowRequest.objects.filter(
             book=book,
             requester=user_profile,
-            requested_duration_days=duration_days,
-            notes=notes,
             status='pending'
-        )
+        ).first()
         
-        messages.success(request, f'Your borrow request for "{book.title}" has been submitted and is pending approval from a librarian.')
-        return redirect('books:book_detail', pk=book.pk)
-    
-    # If GET request, show the borrow request form
-    context = {
-        'book': book,
-        'user_profile': user_profile,
-    }
-    return render(request, 'books/borrow_request_form.html', context)
+        if existing_request:
+            messages.warning(request, f'You already have a pending request for "{book.title}".')
+            return redirect('books:book_detail', pk=book.pk)
+        
+        if request.method == 'POST':
+            duration_days = int(request.POST.get('duration_days', 14))
+            notes = request.POST.get('notes', '')
+            
+            # Create borrow request
+            borrow_request = BorrowRequest.objects.create(
+                book=book,
+                requester=user_profile,
+                requested_duration_days=duration_days,
+                notes=notes,
+                status='pending'
+            )
+            
+            messages.success(request, f'Your borrow request for "{book.title}" has been submitted and is pending approval from a librarian.')
+            return redirect('books:book_detail', pk=book.pk)
+        
+        # If GET request, show the borrow request form
+        context = {
+            'book': book,
+            'user_profile': user_profile,
+        }
+        return render(request, 'books/borrow_request_form.html', context)
 
 
 @librarian_required
 def manage_borrow_requests(request):
     """View for librarians to manage borrow and return requests"""
     # Borrow requests
-    pending_borrow_requests = BorrowRequest.objects.filter(status='pending').order_by('-request_date')
-    processed_borrow_requests = BorrowRequest.objects.exclude(status='pending').order_by('-processed_date')[:20]
+    # Join exactly the relations the template renders for each list
+    pending_borrow_requests = BorrowRequest.objects.filter(status='pending').select_related(
+        'book', 'requester__user'
+    ).order_by('-request_date')
+    processed_borrow_requests = BorrowRequest.objects.exclude(status='pending').select_related(
+        'book', 'requester__user', 'processed_by__user'
+    ).order_by('-processed_date')[:20]
     
     # Return requests
-    pending_return_requests = ReturnRequest.objects.filter(status='pending').order_by('-request_date')
-    processed_return_requests = ReturnRequest.objects.exclude(status='pending').order_by('-processed_date')[:20]
+    pending_return_requests = ReturnRequest.objects.filter(status='pending').select_related(
+        'borrowing__book', 'requester__user'
+    ).order_by('-request_date')
+    processed_return_requests = ReturnRequest.objects.exclude(status='pending').select_related(
+        'borrowing__book', 'processed_by__user'
+    ).order_by('-processed_date')[:20]
     
     context = {
         'pending_borrow_requests': pending_borrow_requests,
@@ -454,41 +470,25 @@ def approve_borrow_request(request, request_id):
     if request.method == 'POST':
         admin_notes = request.POST.get('admin_notes', '')
         
-        # Check if book is still available
-        if not borrow_request.book.is_available:
-            messages.error(request, f'Book "{borrow_request.book.title}" is no longer available.')
-            return redirect('books:manage_borrow_requests')
-        
-        # Create actual borrowing record
-        due_date = date.today() + timedelta(days=borrow_request.requested_duration_days)
-        borrowing = Borrower.objects.create(
-            book=borrow_request.book,
-            borrower=borrow_request.requester,
-            due_date=due_date,
-            status='borrowed'
-        )
-        
-        # Update book availability
-        borrow_request.book.is_available = False
-        borrow_request.book.save()
-        
-        # Update user's current books count
-        borrow_request.requester.current_books_count += 1
-        borrow_request.requester.save()
-        
-        # Update request status
-        borrow_request.status = 'approved'
-        borrow_request.admin_notes = admin_notes
-        
-        # Handle users without UserProfileinfo (like superusers)
-        try:
-            borrow_request.processed_by = request.user.userprofileinfo
-        except UserProfileinfo.DoesNotExist:
-            # For superusers or users without profiles, create a minimal profile or set to None
-            borrow_request.processed_by = None
-        
-        borrow_request.processed_date = timezone.now()
-        borrow_request.save()
+        with transaction.atomic():
+            # Lock the request and its book so two librarians can't approve the same copy twice
+            borrow_request = get_object_or_404(
+                BorrowRequest.objects.select_for_update().select_related('book', 'requester'),
+                id=request_id, status='pending'
+            )
+            
+            # Check if book is still available
+            if not borrow_request.book.is_available:
+                messages.error(request, f'Book "{borrow_request.book.title}" is no longer available.')
+                return redirect('books:manage_borrow_requests')
+            
+            # Handle users without UserProfileinfo (like superusers)
+            try:
+                processed_by = request.user.userprofileinfo
+            except UserProfileinfo.DoesNotExist:
+                processed_by = None
+            
+            borrow_request.approve(processed_by=processed_by, admin_notes=admin_notes)
         
         messages.success(request, f'Borrow request approved. "{borrow_request.book.title}" has been borrowed by {borrow_request.requester.user.username}.')
         return redirect('books:manage_borrow_requests')
@@ -535,7 +535,7 @@ def approve_return_request(request, request_id):
         
         # Update book and user status
         borrowing.book.is_available = True
-        borrowing.book.save()
+        borrowing.book.save(update_fields=['is_available', 'last_updated'])
         
         # Safely decrement current_books_count
         if borrowing.borrower.current_books_count > 0:
@@ -733,7 +733,7 @@ def process_return_directly(request, borrowing_id):
     
     # Update book and user status
     borrowing.book.is_available = True
-    borrowing.book.save()
+    borrowing.book.save(update_fields=['is_available', 'last_updated'])
     
     # Safely decrement current_books_count (prevent negative values)
     if borrowing.borrower.current_books_count > 0:
@@ -784,33 +784,36 @@ def process_return_directly(request, borrowing_id):
 @login_required
 def reserve_book(request, book_id):
     """Reserve a book"""
-    book = get_object_or_404(Book, id=book_id)
     user_profile = get_object_or_404(UserProfileinfo, user=request.user)
     
-    if book.is_available:
-        messages.error(request, 'This book is available for borrowing. No need to reserve.')
-        return redirect('books:book_detail', pk=book.pk)
-    
-    # Check if user already has a reservation for this book
-    existing_reservation = BookReservation.objects.filter(
-        book=book, user=user_profile, status='active'
-    ).exists()
-    
-    if existing_reservation:
-        messages.error(request, 'You already have an active reservation for this book.')
+    with transaction.atomic():
+        # Lock the book so two clicks can't both pass the reservation check below
+        book = get_object_or_404(Book.objects.select_for_update(), id=book_id)
+        
+        if book.is_available:
+            messages.error(request, 'This book is available for borrowing. No need to reserve.')
+            return redirect('books:book_detail', pk=book.pk)
+        
+        # Check if user already has a reservation for this book
+        existing_reservation = BookReservation.objects.filter(
+            book=book, user=user_profile, status='active'
+        ).exists()
+        
+        if existing_reservation:
+            messages.error(request, 'You already have an active reservation for this book.')
+            return redirect('books:book_detail', pk=book.pk)
+        
+        # Create reservation
+        expiry_date = date.today() + timedelta(days=7)  # Reservation expires in 7 days
+        reservation = BookReservation.objects.create(
+            book=book,
+            user=user_profile,
+            expiry_date=expiry_date,
+            status='active'
+        )
+        
+        messages.success(request, f'You have successfully reserved "{book.title}". You will be notified when it becomes available.')
         return redirect('books:book_detail', pk=book.pk)
-    
-    # Create reservation
-    expiry_date = date.today() + timedelta(days=7)  # Reservation expires in 7 days
-    reservation = BookReservation.objects.create(
-        book=book,
-        user=user_profile,
-        expiry_date=expiry_date,
-        status='active'
-    )
-    
-    messages.success(request, f'You have successfully reserved "{book.title}". You will be notified when it becomes available.')
-    return redirect('books:book_detail', pk=book.pk)
 
 
 @login_required
@@ -919,31 +922,33 @@ def barcode_lookup_api(request):
 @login_required
 def quick_borrow(request, book_id):
     """Quick borrow functionality for barcode scanning"""
-    book = get_object_or_404(Book, id=book_id)
-    
-    if not book.is_available:
-        messages.error(request, f'Book "{book.title}" is not available for borrowing.')
-        return redirect('books:barcode_scan')
-    
     # Get or create user profile
     user_profile, created = UserProfileinfo.objects.get_or_create(
         user=request.user,
         defaults={'status': 'active'}
     )
     
-    # Create borrowing record
-    due_date = date.today() + timedelta(days=14)  # 2 weeks borrowing period
-    
-    borrowing = Borrower.objects.create(
-        book=book,
-        borrower=user_profile,
-        due_date=due_date,
-        status='borrowed'
-    )
-    
-    # Update book availability
-    book.is_available = False
-    book.save()
+    with transaction.atomic():
+        # Lock the book so two scans can't lend the same copy twice
+        book = get_object_or_404(Book.objects.select_for_update(), id=book_id)
+        
+        if not book.is_available:
+            messages.error(request, f'Book "{book.title}" is not available for borrowing.')
+            return redirect('books:barcode_scan')
+        
+        # Create borrowing record
+        due_date = date.today() + timedelta(days=14)  # 2 weeks borrowing period
+        
+        borrowing = Borrower.objects.create(
+            book=book,
+            borrower=user_profile,
+            due_date=due_date,
+            status='borrowed'
+        )
+        
+        # Update book availability
+        book.is_available = False
+        book.save(update_fields=['is_available', 'last_updated'])
     
     # Send confirmation email
     try:
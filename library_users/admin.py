@@ -1,8 +1,6 @@
 from import_export.admin import ImportExportModelAdmin
 from django.contrib import admin
-from .models import UserProfileinfo
-from .models import  Contact
-from .models import UserProfileinfo
+from .models import UserProfileinfo, Contact
 from import_export import resources
 # Register your models here.
 
@@ -12,6 +10,7 @@ class UserProfileinfoResource(resources.ModelResource):
         model = UserProfileinfo
 class UserProfileinfoAdmin(ImportExportModelAdmin):
     resource_class = UserProfileinfoResource
+    search_fields = ['user__username', 'user__email', 'user__first_name', 'user__last_name']
 admin.site.register(UserProfileinfo, UserProfileinfoAdmin)
 
 
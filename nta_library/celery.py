@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from kombu import Queue
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -14,6 +15,10 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Declare every queue so a worker started without -Q consumes them all;
+# CELERY_TASK_ROUTES sends the user-triggered emails to 'email'
+app.conf.task_queues = (Queue('celery'), Queue('email'))
+
 # Celery Beat Schedule for periodic tasks
 app.conf.beat_schedule = {
     'send-daily-notifications': {
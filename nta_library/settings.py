@@ -171,6 +171,12 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Emails triggered by user actions get their own queue so they are not held up behind reports
+CELERY_TASK_ROUTES = {
+    'books.tasks.send_welcome_email': {'queue': 'email'},
+    'books.tasks.send_reservation_available_notification': {'queue': 'email'},
+    'books.tasks.send_return_confirmation': {'queue': 'email'},
+}
 
 # Logging Configuration
 LOGGING = {
@@ -255,6 +261,10 @@ DATABASES = {
     )
 }
 
+# Trigram lookups used by the admin book search (see books/migrations/0004)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    INSTALLED_APPS.append('django.contrib.postgres')
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 